@@ -0,0 +1,100 @@
+"""主动学习：用已有标注在后台进程中训练一个小的 softmax 回归模型（纯 NumPy、仅 CPU），
+对未标注音频打分，把模型最拿不准的排到队列最前面。
+
+特征来自数据集目录下的 features.npz（见 features.py）。
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+RETRAIN_EVERY = 20  # 每新增这么多条标注重新训练一次
+
+
+def train_softmax(X, y, n_classes, l2=1e-2, iterations=500, lr=0.5):
+    """全批量梯度下降训练多类 logistic 回归；按类别频率反比加权，避免只预测多数类"""
+    mean = X.mean(axis=0)
+    std = X.std(axis=0) + 1e-6
+    Z = (X - mean) / std
+    onehot = np.eye(n_classes)[y]
+    counts = np.bincount(y, minlength=n_classes)
+    weights = (len(y) / (n_classes * np.maximum(counts, 1)))[y][:, None]
+    W = np.zeros((X.shape[1], n_classes))
+    b = np.zeros(n_classes)
+    for _ in range(iterations):
+        probs = _softmax(Z @ W + b)
+        grad = (probs - onehot) * weights / len(y)
+        W -= lr * (Z.T @ grad + l2 * W)
+        b -= lr * grad.sum(axis=0)
+    return {"mean": mean, "std": std, "W": W, "b": b}
+
+
+def predict_proba(model, X):
+    return _softmax((X - model["mean"]) / model["std"] @ model["W"] + model["b"])
+
+
+def uncertainty(probs):
+    """归一化熵：1 表示各类概率相同（最不确定），0 表示完全确定"""
+    p = np.clip(probs, 1e-12, 1)
+    return -(p * np.log(p)).sum(axis=1) / np.log(probs.shape[1])
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(logits)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def rank_unlabelled(features_path, labels, classes):
+    """子进程中执行：训练并返回 (按不确定性从高到低排序的未标注文件, 训练条数, 训练集准确率)。
+
+    labels 为 {文件名: 标签}；已标注的类别少于两个时返回 None。
+    """
+    with np.load(features_path, allow_pickle=False) as data:
+        files = [str(name) for name in data["files"]]
+        X = data["values"].astype(np.float64)
+    class_index = {label: i for i, label in enumerate(classes)}
+    train = [(i, class_index[labels[name]]) for i, name in enumerate(files)
+             if labels.get(name) in class_index]
+    if len({c for _, c in train}) < 2:
+        return None
+    rows = np.array([i for i, _ in train])
+    y = np.array([c for _, c in train])
+    model = train_softmax(X[rows], y, len(classes))
+    accuracy = float((predict_proba(model, X[rows]).argmax(axis=1) == y).mean())
+
+    pool = np.array([i for i, name in enumerate(files) if name not in labels], dtype=np.int64)
+    if not len(pool):
+        return [], len(y), accuracy
+    scores = uncertainty(predict_proba(model, X[pool]))
+    order = pool[np.argsort(-scores, kind="stable")]
+    return [files[i] for i in order], len(y), accuracy
+
+
+class ActiveLearner:
+    """在单独的进程中训练与打分，界面线程不做任何计算；同一时间只运行一个训练任务"""
+
+    def __init__(self, features_path, classes):
+        self.features_path = features_path
+        self.classes = list(classes)
+        self.labels_at_last_run = 0
+        self._executor = ProcessPoolExecutor(max_workers=1)
+        self._future = None
+
+    @property
+    def busy(self):
+        return self._future is not None and not self._future.done()
+
+    def due(self, label_count):
+        """距上次训练新增的标注是否已达到 RETRAIN_EVERY"""
+        return label_count - self.labels_at_last_run >= RETRAIN_EVERY
+
+    def submit(self, labels):
+        """提交一次训练；已有任务在运行时返回 None"""
+        if self.busy:
+            return None
+        self.labels_at_last_run = len(labels)
+        self._future = self._executor.submit(rank_unlabelled, self.features_path, labels, self.classes)
+        return self._future
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
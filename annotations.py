@@ -0,0 +1,235 @@
+"""多类别、多标注员的标注库（SQLite），以及合并与一致性统计。
+
+用法：
+    python annotations.py import 库.db labels.csv --annotator 张三
+    python annotations.py merge 总库.db 标注员1.db 标注员2.db ...
+    python annotations.py stats 总库.db
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from label_store import LabelStore
+
+DEFAULT_CLASSES = ("1", "0")
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    file       TEXT NOT NULL,
+    annotator  TEXT NOT NULL,
+    label      TEXT NOT NULL,
+    confidence REAL,
+    created    REAL NOT NULL,
+    PRIMARY KEY (file, annotator)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS annotations_annotator ON annotations (annotator, file);
+CREATE TABLE IF NOT EXISTS classes (
+    position INTEGER PRIMARY KEY,
+    label    TEXT NOT NULL UNIQUE
+);
+"""
+INSERT_ANNOTATION = ("INSERT OR REPLACE INTO annotations (file, annotator, label, confidence, created) "
+                     "VALUES (?, ?, ?, ?, ?)")
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class AnnotationStore:
+    """SQLite 标注库。接口与 LabelStore 相同（get/set/flush/close 等），但只看当前标注员的记录。
+
+    (file, annotator) 为主键，按文件名查询走主键索引；每条记录带时间戳和可选置信度。
+    """
+
+    def __init__(self, db_path, annotator, classes=None):
+        self.db_path = db_path
+        self.annotator = annotator
+        self._conn = connect(db_path)
+        self._lock = threading.Lock()
+        if classes is not None:
+            self.set_classes(classes)
+        self._labels = dict(self._conn.execute(
+            "SELECT file, label FROM annotations WHERE annotator = ?", (annotator,)))
+
+    def __contains__(self, file_name):
+        return file_name in self._labels
+
+    def __len__(self):
+        return len(self._labels)
+
+    def get(self, file_name, default=None):
+        return self._labels.get(file_name, default)
+
+    def labelled_files(self):
+        with self._lock:
+            return set(self._labels)
+
+    def classes(self):
+        return [row[0] for row in self._conn.execute("SELECT label FROM classes ORDER BY position")]
+
+    def set_classes(self, classes):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM classes")
+            self._conn.executemany("INSERT INTO classes (position, label) VALUES (?, ?)",
+                                   enumerate(str(c) for c in classes))
+
+    def set(self, file_name, label, flush=True, confidence=None):
+        with self._lock:
+            self._labels[file_name] = str(label)
+            self._conn.execute(INSERT_ANNOTATION,
+                               (file_name, self.annotator, str(label), confidence, time.time()))
+            if flush:
+                self._conn.commit()
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def open_label_store(path, annotator, classes=None):
+    """按扩展名选择标注存储：.db/.sqlite 为多人 SQLite 库，其余为单人 CSV"""
+    if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS:
+        return AnnotationStore(path, annotator, classes)
+    return LabelStore(path)
+
+
+# ===== 导入、合并与统计 =====
+
+def import_csv(db_path, csv_path, annotator):
+    """导入 labels.csv（file,label）或 annotations.csv（filename,label），返回导入条数"""
+    conn = connect(db_path)
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        rows = [(row.get("file") or row.get("filename"), row["label"]) for row in csv.DictReader(f)]
+    mtime = os.path.getmtime(csv_path)
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO annotations (file, annotator, label, confidence, created) "
+            "VALUES (?, ?, ?, NULL, ?)",
+            [(name, annotator, label, mtime) for name, label in rows if name])
+    conn.close()
+    return len(rows)
+
+
+def merge(target_path, source_paths):
+    """把多个标注库合并到 target；同一 (文件, 标注员) 保留时间最新的一条"""
+    conn = connect(target_path)
+    for path in source_paths:
+        conn.execute("ATTACH DATABASE ? AS src", (path,))
+        with conn:
+            conn.execute("""
+                INSERT INTO annotations (file, annotator, label, confidence, created)
+                SELECT file, annotator, label, confidence, created FROM src.annotations WHERE true
+                ON CONFLICT (file, annotator) DO UPDATE SET
+                    label = excluded.label, confidence = excluded.confidence, created = excluded.created
+                WHERE excluded.created > annotations.created
+            """)
+            if not conn.execute("SELECT 1 FROM classes LIMIT 1").fetchone():
+                conn.execute("INSERT INTO classes SELECT * FROM src.classes")
+        conn.execute("DETACH DATABASE src")
+    conn.close()
+
+
+def agreement(db_path):
+    """一致性统计：按文件流式读取（不整体载入内存），返回 dict。
+
+    - items: 至少两人标注的文件数
+    - observed: 两两一致的比例（所有文件的标注对合计）
+    - fleiss_kappa: 允许每个文件标注人数不同的 Fleiss' kappa
+    - pairwise: {(标注员A, 标注员B): (共同文件数, 一致率)}
+    """
+    conn = connect(db_path)
+    items = 0
+    agree_pairs = total_pairs = 0
+    p_sum = 0.0
+    class_totals = Counter()
+    pair_stats = defaultdict(lambda: [0, 0])
+
+    def finish(labels):
+        nonlocal items, agree_pairs, total_pairs, p_sum
+        n = len(labels)
+        if n < 2:
+            return
+        counts = Counter(label for _, label in labels)
+        agree = sum(c * (c - 1) for c in counts.values()) // 2
+        pairs = n * (n - 1) // 2
+        items += 1
+        agree_pairs += agree
+        total_pairs += pairs
+        p_sum += agree / pairs
+        class_totals.update({label: c / n for label, c in counts.items()})
+        for i in range(n):
+            for j in range(i + 1, n):
+                (a, la), (b, lb) = labels[i], labels[j]
+                stat = pair_stats[(a, b)]
+                stat[0] += 1
+                stat[1] += la == lb
+
+    current, labels = None, []
+    for file_name, annotator, label in conn.execute(
+            "SELECT file, annotator, label FROM annotations ORDER BY file, annotator"):
+        if file_name != current:
+            finish(labels)
+            current, labels = file_name, []
+        labels.append((annotator, label))
+    finish(labels)
+    conn.close()
+
+    kappa = None
+    if items:
+        p_bar = p_sum / items
+        p_e = sum((v / items) ** 2 for v in class_totals.values())
+        kappa = (p_bar - p_e) / (1 - p_e) if p_e < 1 else 1.0
+    return {
+        "items": items,
+        "observed": agree_pairs / total_pairs if total_pairs else None,
+        "fleiss_kappa": kappa,
+        "pairwise": {pair: (n, same / n) for pair, (n, same) in pair_stats.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多人标注库：导入、合并与一致性统计")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import", help="导入 CSV 标注")
+    p.add_argument("db")
+    p.add_argument("csv")
+    p.add_argument("--annotator", required=True)
+    p = sub.add_parser("merge", help="合并多个标注库")
+    p.add_argument("target")
+    p.add_argument("sources", nargs="+")
+    p = sub.add_parser("stats", help="标注一致性统计")
+    p.add_argument("db")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        print(f"已导入 {import_csv(args.db, args.csv, args.annotator)} 条")
+    elif args.command == "merge":
+        merge(args.target, args.sources)
+        print(f"已合并 {len(args.sources)} 个标注库到 {args.target}")
+    else:
+        stats = agreement(args.db)
+        print(f"多人标注文件数: {stats['items']}")
+        if stats["items"]:
+            print(f"两两一致率: {stats['observed']:.3f}")
+            print(f"Fleiss' kappa: {stats['fleiss_kappa']:.3f}")
+            for (a, b), (n, rate) in sorted(stats["pairwise"].items()):
+                print(f"  {a} / {b}: {n} 个共同文件，一致率 {rate:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
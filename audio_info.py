@@ -0,0 +1,233 @@
+import json
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from file_index import save_cache
+
+WavInfo = namedtuple("WavInfo", "format_tag channels samplerate bits_per_sample block_align data_offset data_size")
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_wav_info(path):
+    """只解析 WAV 文件头（fmt 与 data 块位置），不读取采样数据"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError(f"WAV 文件头不完整: {path}")
+        riff, _, wave = struct.unpack("<4sI4s", header)
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"不是 WAV 文件: {path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV 文件缺少 data 块: {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                if len(body) < 16:
+                    raise ValueError(f"WAV 文件 fmt 块不完整: {path}")
+                format_tag, channels, samplerate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    format_tag = struct.unpack("<H", body[24:26])[0]  # SubFormat GUID 的前两个字节
+                fmt = (format_tag, channels, samplerate, bits, block_align)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV 文件 data 块出现在 fmt 块之前: {path}")
+                offset = f.tell()
+                # 录音中断的文件 data 长度可能未回填，以实际文件大小为准
+                data_size = min(chunk_size, file_size - offset)
+                format_tag, channels, samplerate, bits, block_align = fmt
+                return WavInfo(format_tag, channels, samplerate, bits, block_align, offset, data_size)
+            else:
+                f.seek(chunk_size, os.SEEK_CUR)
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)  # 块按偶数字节对齐
+
+
+def wav_duration(path):
+    info = read_wav_info(path)
+    if not info.samplerate or not info.block_align:
+        return 0.0
+    return info.data_size // info.block_align / info.samplerate
+
+
+# ===== MP3 =====
+
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLERATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+Mp3Frame = namedtuple("Mp3Frame", "version layer samplerate samples length mono")
+
+
+def parse_mp3_frame_header(b):
+    """解析 4 字节 MPEG 音频帧头，不合法时返回 None"""
+    if len(b) < 4 or b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}.get((b[1] >> 3) & 3)
+    layer = {1: 3, 2: 2, 3: 1}.get((b[1] >> 1) & 3)
+    bitrate_index = b[2] >> 4
+    samplerate_index = (b[2] >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or samplerate_index == 3:
+        return None  # 保留值或自由格式码率
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    samplerate = _MP3_SAMPLERATES[version][samplerate_index]
+    padding = (b[2] >> 1) & 1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // samplerate + padding) * 4
+    else:
+        samples = 576 if (layer == 3 and version != 1) else 1152
+        length = samples // 8 * bitrate // samplerate + padding
+    return Mp3Frame(version, layer, samplerate, samples, length, (b[3] >> 6) == 3)
+
+
+def _skip_id3v2(f):
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def mp3_duration(path):
+    """MP3 时长：优先读取 Xing/Info/VBRI 头中的总帧数，没有时逐帧扫描帧头"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = _skip_id3v2(f)
+        # 在标签之后寻找第一个同步帧
+        f.seek(pos)
+        head = f.read(64 * 1024)
+        first = None
+        for i in range(len(head) - 3):
+            first = parse_mp3_frame_header(head[i:i + 4])
+            if first is not None:
+                pos += i
+                break
+        if first is None:
+            return 0.0
+
+        f.seek(pos)
+        frame = f.read(first.length)
+        if first.version == 1:
+            xing_offset = 4 + (17 if first.mono else 32)
+        else:
+            xing_offset = 4 + (9 if first.mono else 17)
+        tag = frame[xing_offset:xing_offset + 4]
+        if tag in (b"Xing", b"Info"):
+            flags = struct.unpack(">I", frame[xing_offset + 4:xing_offset + 8])[0]
+            if flags & 1:
+                frames = struct.unpack(">I", frame[xing_offset + 8:xing_offset + 12])[0]
+                return frames * first.samples / first.samplerate
+        if frame[36:40] == b"VBRI":
+            frames = struct.unpack(">I", frame[50:54])[0]
+            return frames * first.samples / first.samplerate
+
+        # 无 VBR 头：只读每帧 4 字节帧头，按帧长跳转
+        samples = 0
+        while pos + 4 <= file_size:
+            f.seek(pos)
+            header = parse_mp3_frame_header(f.read(4))
+            if header is None:
+                break
+            samples += header.samples
+            pos += header.length
+        return samples / first.samplerate
+
+
+def audio_duration(path):
+    """音频时长（秒），无法解析时返回 0"""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".wav":
+            return wav_duration(path)
+        if ext == ".mp3":
+            return mp3_duration(path)
+    except (OSError, ValueError, struct.error):
+        pass
+    return 0.0
+
+
+# ===== 时长索引 =====
+
+class DurationIndex:
+    """数据集时长索引：文件头解析一次，保存在数据集目录下的 durations.json 中跨会话复用。
+
+    每条记录带文件大小与修改时间，文件变化后自动重新解析。
+    """
+
+    FILE_NAME = "durations.json"
+
+    def __init__(self, dataset_folder, audio_folder):
+        self.path = os.path.join(dataset_folder, self.FILE_NAME)
+        self.audio_folder = audio_folder
+        self._entries = {}  # file -> [size, mtime_ns, duration]
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f).get("files", {})
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, file_name):
+        """返回已缓存的时长（秒），不做任何磁盘 I/O，可在 Tk 线程中调用；
+        尚未索引时返回 None，由后台 build 补齐"""
+        with self._lock:
+            entry = self._entries.get(file_name)
+        return None if entry is None else entry[2]
+
+    def lookup(self, file_name):
+        """返回时长（秒），缓存未命中或已过期时读取文件头。文件不存在时抛出 OSError，只在后台线程中调用"""
+        st = os.stat(os.path.join(self.audio_folder, file_name))
+        with self._lock:
+            entry = self._entries.get(file_name)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        duration = audio_duration(os.path.join(self.audio_folder, file_name))
+        with self._lock:
+            self._entries[file_name] = [st.st_size, st.st_mtime_ns, duration]
+            self._dirty = True
+        return duration
+
+    def as_dict(self):
+        """{文件名: 时长} 快照"""
+        with self._lock:
+            return {name: entry[2] for name, entry in self._entries.items()}
+
+    def build(self, file_names):
+        """为整个文件夹建立索引（可在后台线程中调用），完成后写盘"""
+        for name in file_names:
+            try:
+                self.lookup(name)
+            except OSError:
+                continue
+        self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": 1, "files": self._entries}
+
+            def write(tmp_path):
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+            if save_cache(self.path, write):
+                self._dirty = False
@@ -0,0 +1,52 @@
+"""命令行批处理的公共部分：多进程执行、同一行刷新进度与剩余时间、最后汇总失败条目。"""
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class Batch:
+    """多进程执行 job(item)。迭代时按输入顺序产出结果，每秒刷新一次进度；结束后 elapsed 为总用时（秒）。
+
+    job 必须是模块级函数（或其 functools.partial），以便传给子进程。
+    """
+
+    def __init__(self, job, items, workers, chunksize=16):
+        self.job = job
+        self.items = list(items)
+        self.workers = workers
+        self.chunksize = chunksize
+        self.elapsed = 0.0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        total = len(self.items)
+        start = last_report = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for done, result in enumerate(pool.map(self.job, self.items, chunksize=self.chunksize), 1):
+                yield result
+                now = time.perf_counter()
+                if now - last_report >= 1 or done == total:
+                    last_report = now
+                    rate = done / (now - start)
+                    eta = (total - done) / rate if rate else 0
+                    print(f"\r[{done}/{total}] {rate:.1f} 条/秒，剩余约 {eta:.0f} 秒", end="", flush=True)
+        self.elapsed = time.perf_counter() - start
+        print()
+
+    def report(self, failed, summary=None):
+        """打印汇总行与失败条目 [(文件名, 错误信息)]，返回进程退出码"""
+        if summary is None:
+            elapsed = max(self.elapsed, 1e-9)
+            summary = (f"完成：{len(self.items) - len(failed)} 条，用时 {self.elapsed:.1f} 秒，"
+                       f"平均 {len(self.items) / elapsed:.1f} 条/秒")
+        print(summary)
+        return report_failures(failed)
+
+
+def report_failures(failed):
+    """打印失败条目 [(文件名, 错误信息)]，返回进程退出码"""
+    for name, error in failed:
+        print(f"失败: {name}: {error}", file=sys.stderr)
+    return 1 if failed else 0
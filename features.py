@@ -0,0 +1,143 @@
+"""逐条音频的声学特征索引：RMS、峰值、频谱质心与分频带能量。
+
+结果保存在数据集目录下的 features.npz 中（文件名、大小、修改时间与特征矩阵），
+标注工具据此对导航列表排序或筛选。
+
+用法：
+    python features.py 数据集目录 [--workers N] [--force]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from batch import Batch
+from file_index import FileIndex
+from manifest import AUDIO_EXTENSIONS, scan_folder
+from spectrogram import N_FFT, frame_blocks, load_source
+
+BAND_EDGES = (0, 500, 1000, 2000, 4000, 8000, 16000, 32000, np.inf)  # Hz
+FEATURES = (["rms_db", "peak_db", "centroid_hz"]
+            + [f"band_{int(lo)}_{'max' if np.isinf(hi) else int(hi)}_db"
+               for lo, hi in zip(BAND_EDGES[:-1], BAND_EDGES[1:])])
+FEATURE_NAMES = {
+    "rms_db": "RMS 能量 (dB)",
+    "peak_db": "峰值 (dB)",
+    "centroid_hz": "频谱质心 (Hz)",
+}
+
+
+def feature_label(name):
+    """界面显示用的特征名"""
+    if name in FEATURE_NAMES:
+        return FEATURE_NAMES[name]
+    _, lo, hi, _ = name.split("_")
+    if hi == "max":
+        return f"频带 {lo} Hz 以上 (dB)"
+    return f"频带 {lo}–{hi} Hz (dB)"
+
+
+def _db(power):
+    return 10 * np.log10(max(power, 1e-20))
+
+
+def extract_features(path):
+    """分块计算一条音频的特征，内存占用与时长无关。返回与 FEATURES 对应的 float 列表"""
+    samples, samplerate = load_source(path)
+    length = len(samples)
+    spectrum = np.zeros(N_FFT // 2 + 1)
+    sum_sq = 0.0
+    peak = 0.0
+    n_frames = 0
+    for block, power in frame_blocks(samples, N_FFT):
+        sum_sq += float(np.dot(block, block))
+        peak = max(peak, float(np.abs(block).max(initial=0.0)))
+        spectrum += power.sum(axis=0)
+        n_frames += len(power)
+
+    freqs = np.fft.rfftfreq(N_FFT, 1 / samplerate)
+    total = spectrum.sum()
+    values = [
+        _db(sum_sq / length) if length else -200.0,
+        20 * np.log10(max(peak, 1e-10)),
+        float((freqs * spectrum).sum() / total) if total > 0 else 0.0,
+    ]
+    scale = max(n_frames, 1)
+    for lo, hi in zip(BAND_EDGES[:-1], BAND_EDGES[1:]):
+        values.append(_db(spectrum[(freqs >= lo) & (freqs < hi)].sum() / scale))
+    return values
+
+
+def extract_one(path):
+    """子进程中执行，返回 (文件名, 特征列表或 None, 错误信息或 None)"""
+    try:
+        return os.path.basename(path), extract_features(path), None
+    except (OSError, RuntimeError, ValueError) as e:
+        return os.path.basename(path), None, str(e)
+
+
+class FeatureIndex(FileIndex):
+    """数据集特征索引（features.npz），每条记录为与 FEATURES 对应的 float32 向量"""
+
+    FILE_NAME = "features.npz"
+    compute = staticmethod(extract_one)
+
+    def get(self, file_name):
+        """返回 {特征名: 值}，未计算时返回 None"""
+        with self._lock:
+            entry = self._entries.get(file_name)
+        return None if entry is None else dict(zip(FEATURES, entry[2].tolist()))
+
+    def column(self, feature):
+        """{文件名: 某个特征的值}"""
+        col = FEATURES.index(feature)
+        with self._lock:
+            return {name: float(entry[2][col]) for name, entry in self._entries.items()}
+
+    def _load_values(self, data):
+        # 特征列表变化后旧索引作废，全部重新计算
+        if [str(n) for n in data["features"]] != FEATURES:
+            return None
+        return data["values"]
+
+    def _value_arrays(self, values):
+        return {
+            "features": np.array(FEATURES),
+            "values": np.stack(values) if values else np.zeros((0, len(FEATURES)), np.float32),
+        }
+
+    def _convert(self, values):
+        return np.asarray(values, dtype=np.float32)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量计算音频特征，写入数据集目录下的 features.npz")
+    parser.add_argument("dataset", help="包含 audio/ 的数据集目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="进程数（默认全部核心）")
+    parser.add_argument("--force", action="store_true", help="忽略已有索引，全部重新计算")
+    args = parser.parse_args(argv)
+
+    audio_folder = os.path.join(args.dataset, "audio")
+    if not os.path.isdir(audio_folder):
+        parser.error(f"未找到 {audio_folder}")
+    index = FeatureIndex(args.dataset, audio_folder)
+    names = scan_folder(audio_folder, AUDIO_EXTENSIONS)
+    todo = names if args.force else index.stale(names)
+    print(f"共需计算 {len(todo)} 条，{args.workers} 个进程")
+    if not todo:
+        return 0
+
+    failed = []
+    batch = Batch(extract_one, [os.path.join(audio_folder, name) for name in todo], args.workers)
+    for name, values, error in batch:
+        if error is not None:
+            failed.append((name, error))
+        else:
+            index.update(name, values)
+    index.save()
+    return batch.report(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
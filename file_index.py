@@ -0,0 +1,114 @@
+"""数据集目录下的逐文件缓存：先写临时文件再替换的保存函数，以及按大小与修改时间失效的 .npz 索引基类。"""
+import os
+import threading
+
+import numpy as np
+
+
+def save_cache(path, write):
+    """调用 write(临时路径) 写入后替换 path，不会留下写了一半的文件。
+
+    数据集目录只读时返回 False，缓存只在本次会话内有效；调用方保留脏标记，下次再试。
+    """
+    tmp_path = path + ".tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        return False
+    return True
+
+
+class FileIndex:
+    """每条音频一条计算结果的 .npz 索引（files、size、mtime_ns 三列加子类的数据列）。
+
+    每条记录带文件大小与修改时间，文件变化后重新计算。子类定义：
+    - FILE_NAME：数据集目录下的文件名
+    - compute(path)：返回 (文件名, 结果或 None, 错误信息或 None)，可在子进程中执行
+    - _load_values(data)：从 npz 读出与 files 对齐的结果；格式不兼容时返回 None
+    - _value_arrays(values)：把结果列表转为要保存的数组 {列名: ndarray}
+    - _convert(value)：update 时规范结果的类型（默认原样保存）
+    """
+
+    FILE_NAME = None
+
+    def __init__(self, dataset_folder, audio_folder):
+        self.path = os.path.join(dataset_folder, self.FILE_NAME)
+        self.audio_folder = audio_folder
+        self._entries = {}  # file -> (size, mtime_ns, 结果)
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with np.load(self.path, allow_pickle=False) as data:
+                    values = self._load_values(data)
+                    if values is not None:
+                        for name, size, mtime, value in zip(data["files"], data["size"], data["mtime_ns"], values):
+                            self._entries[str(name)] = (int(size), int(mtime), value)
+            except (OSError, ValueError, KeyError):
+                self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stale(self, file_names):
+        """缺失或已过期（文件大小/修改时间变化）的文件；已不存在的文件跳过"""
+        result = []
+        for name in file_names:
+            try:
+                st = os.stat(os.path.join(self.audio_folder, name))
+            except OSError:
+                continue
+            with self._lock:
+                entry = self._entries.get(name)
+            if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+                result.append(name)
+        return result
+
+    def update(self, file_name, value):
+        st = os.stat(os.path.join(self.audio_folder, file_name))
+        with self._lock:
+            self._entries[file_name] = (st.st_size, st.st_mtime_ns, self._convert(value))
+            self._dirty = True
+
+    def build(self, file_names):
+        """在当前线程中逐条补算缺失的结果（界面后台线程使用），完成后写盘"""
+        for name in self.stale(file_names):
+            _, value, error = self.compute(os.path.join(self.audio_folder, name))
+            if error is None:
+                self.update(name, value)
+        self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            names = sorted(self._entries)
+            arrays = {
+                "files": np.array(names, dtype=str),
+                "size": np.array([self._entries[n][0] for n in names], dtype=np.int64),
+                "mtime_ns": np.array([self._entries[n][1] for n in names], dtype=np.int64),
+            }
+            arrays.update(self._value_arrays([self._entries[n][2] for n in names]))
+
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, **arrays)
+
+            if save_cache(self.path, write):
+                self._dirty = False
+
+    # ===== 子类实现 =====
+
+    @staticmethod
+    def compute(path):
+        raise NotImplementedError
+
+    def _load_values(self, data):
+        raise NotImplementedError
+
+    def _value_arrays(self, values):
+        raise NotImplementedError
+
+    def _convert(self, value):
+        return value
@@ -0,0 +1,150 @@
+"""近重复音频检测：每条音频一个 64 位语谱图指纹，多索引哈希查找汉明距离相近的指纹，并查集分组。
+
+指纹：log 语谱图按块平均缩小到 8 个频带 x 9 个时间段，比较相邻时间段的大小得到 8 x 8 = 64 位，
+与整体音量无关，同一段录音重新导出或转码后指纹几乎不变。
+指纹保存在数据集目录下的 fingerprints.npz 中，文件变化后重新计算。
+
+用法：
+    python fingerprint.py 数据集目录 [--workers N] [--radius 3]
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from batch import Batch, report_failures
+from file_index import FileIndex
+from manifest import AUDIO_EXTENSIONS, scan_folder
+from spectrogram import load_source, stft_power
+
+BANDS = 8
+SEGMENTS = 9
+DEFAULT_RADIUS = 3  # 汉明距离不超过此值视为近重复
+
+
+def fingerprint(path):
+    """计算一条音频的 64 位指纹（Python int）"""
+    samples, _ = load_source(path)
+    power = stft_power(samples, n_fft=1024, hop=512, max_width=256)
+    log_spec = np.log10(power[1:] + 1e-12)
+    grid = np.array([[block.mean() for block in np.array_split(band, SEGMENTS, axis=1)]
+                     for band in np.array_split(log_spec, BANDS, axis=0)])
+    bits = (grid[:, 1:] > grid[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def fingerprint_one(path):
+    """子进程中执行，返回 (文件名, 指纹或 None, 错误信息或 None)"""
+    try:
+        return os.path.basename(path), fingerprint(path), None
+    except (OSError, RuntimeError, ValueError) as e:
+        return os.path.basename(path), None, str(e)
+
+
+class MultiIndexHash:
+    """多索引哈希：64 位分成 radius + 1 段，每段一张哈希表。
+
+    两个指纹汉明距离不超过 radius 时，按抽屉原理至少有一段完全相同，
+    因此只需取出各表中同段的候选再逐个核对距离，不必与全部指纹比较。
+    """
+
+    def __init__(self, hashes, radius=DEFAULT_RADIUS):
+        self.hashes = list(hashes)
+        self.radius = radius
+        bounds = [int(b) for b in np.linspace(0, 64, radius + 2)]
+        self._masks = [(((1 << (hi - lo)) - 1) << lo, lo) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._tables = [defaultdict(list) for _ in self._masks]
+        for i, h in enumerate(self.hashes):
+            for table, (mask, shift) in zip(self._tables, self._masks):
+                table[(h & mask) >> shift].append(i)
+
+    def neighbours(self, h):
+        """返回与 h 的汉明距离不超过 radius 的条目序号"""
+        candidates = set()
+        for table, (mask, shift) in zip(self._tables, self._masks):
+            candidates.update(table.get((h & mask) >> shift, ()))
+        return [i for i in candidates if bin(self.hashes[i] ^ h).count("1") <= self.radius]
+
+
+def group_duplicates(names, hashes, radius=DEFAULT_RADIUS):
+    """并查集合并所有近重复对，返回包含两条及以上音频的组（列表的列表）"""
+    parent = list(range(len(names)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    index = MultiIndexHash(hashes, radius)
+    for i, h in enumerate(index.hashes):
+        for j in index.neighbours(h):
+            if j > i:
+                a, b = find(i), find(j)
+                if a != b:
+                    parent[b] = a
+    groups = defaultdict(list)
+    for i, name in enumerate(names):
+        groups[find(i)].append(name)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+class FingerprintIndex(FileIndex):
+    """数据集指纹索引（fingerprints.npz），每条记录为一个 64 位指纹（Python int）"""
+
+    FILE_NAME = "fingerprints.npz"
+    compute = staticmethod(fingerprint_one)
+
+    def groups(self, file_names, radius=DEFAULT_RADIUS):
+        """file_names 中的近重复组"""
+        with self._lock:
+            names = [name for name in file_names if name in self._entries]
+            hashes = [self._entries[name][2] for name in names]
+        return group_duplicates(names, hashes, radius)
+
+    def _load_values(self, data):
+        return [int(h) for h in data["hash"]]
+
+    def _value_arrays(self, values):
+        return {"hash": np.array(values, dtype=np.uint64)}
+
+    def _convert(self, value):
+        return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="计算语谱图指纹并列出近重复音频组")
+    parser.add_argument("dataset", help="包含 audio/ 的数据集目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="进程数（默认全部核心）")
+    parser.add_argument("--radius", type=int, default=DEFAULT_RADIUS, help="视为近重复的最大汉明距离")
+    args = parser.parse_args(argv)
+
+    audio_folder = os.path.join(args.dataset, "audio")
+    if not os.path.isdir(audio_folder):
+        parser.error(f"未找到 {audio_folder}")
+    index = FingerprintIndex(args.dataset, audio_folder)
+    names = scan_folder(audio_folder, AUDIO_EXTENSIONS)
+    todo = index.stale(names)
+    print(f"共需计算 {len(todo)} 条指纹，{args.workers} 个进程")
+
+    failed = []
+    if todo:
+        batch = Batch(fingerprint_one, [os.path.join(audio_folder, name) for name in todo], args.workers)
+        for name, h, error in batch:
+            if error is not None:
+                failed.append((name, error))
+            else:
+                index.update(name, h)
+        index.save()
+
+    groups = index.groups(names, args.radius)
+    print(f"近重复组 {len(groups)} 个，涉及 {sum(len(g) for g in groups)} 条音频")
+    for members in groups:
+        print("  " + ", ".join(members))
+    return report_failures(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""网格浏览：一屏显示多条音频的语谱图缩略图，多选后批量标注，悬停或按键试听。
+
+缩略图缓存在 spectrogram/.thumbs/ 下，只为滚动到可见范围内的格子在后台线程池中生成或读取；
+已有整幅语谱图时直接缩小，否则从音频计算一幅低分辨率语谱图。
+"""
+import os
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from file_index import save_cache
+from spectrogram import is_up_to_date, load_source, spectrogram_image
+
+THUMB_SIZE = (160, 100)
+COLUMNS = 6
+PAD = 8
+CAPTION_HEIGHT = 18
+CELL_W = THUMB_SIZE[0] + 2 * PAD
+CELL_H = THUMB_SIZE[1] + CAPTION_HEIGHT + 2 * PAD
+VISIBLE_ROWS = 5  # 窗口初始高度
+MARGIN_ROWS = 1  # 可见范围上下各多准备一行，滚动时不露出空白
+THUMB_WORKERS = 4
+HOVER_PLAY_MS = 300  # 鼠标停留超过此时间才开始播放，划过时不会连续切换
+OUTLINE = {"selected": "#ffc107", "hover": "#ffffff", "labelled": "#6c757d", "normal": "#343a40"}
+
+
+def thumbs_dir(spec_folder):
+    return os.path.join(spec_folder, ".thumbs")
+
+
+def load_thumbnail(audio_path, spec_path, thumb_path, size=THUMB_SIZE):
+    """工作线程中执行：返回缩略图（PIL 图像），过期或缺失时重新生成并写入缓存"""
+    if is_up_to_date(audio_path, thumb_path):
+        with Image.open(thumb_path) as src:
+            return src.convert("RGB")
+    if is_up_to_date(audio_path, spec_path):
+        with Image.open(spec_path) as src:
+            img = src.resize(size)
+    else:
+        samples, _ = load_source(audio_path)
+        img = spectrogram_image(samples, max_width=size[0]).resize(size)
+    save_cache(thumb_path, lambda tmp_path: img.save(tmp_path, format="PNG", compress_level=1))
+    return img
+
+
+class Gallery:
+    """网格浏览窗口（Toplevel），标注与播放都经由所属的 AudioLabelTool。
+
+    画布上只保留可见范围内的格子，文件数再多，占用的内存与控件数量也只与窗口大小有关。
+    """
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.files = list(tool.audio_files)  # 打开时的导航顺序
+        self.rows = (len(self.files) + COLUMNS - 1) // COLUMNS
+        self.thumbs_folder = thumbs_dir(tool.spec_folder)
+        os.makedirs(self.thumbs_folder, exist_ok=True)
+        self.selected = set()  # 格子序号
+        self.anchor = None     # Shift 连选的起点
+        self.hover = None
+        self.playing = None
+        self.hover_timer = None
+        self.drawn = {}        # 序号 -> (边框, 图像, 文字) 画布条目
+        self.photos = {}       # 序号 -> PhotoImage，只保留已画出的格子
+        self.labels = {}       # 本窗口中标注的 {文件名: 标签}，写线程落盘前也能显示
+        self._jobs = {}        # 序号 -> Future
+        self._executor = ThreadPoolExecutor(max_workers=THUMB_WORKERS)
+        self.closed = False
+
+        self.root = tk.Toplevel(tool.root)
+        self.root.title(f"网格浏览 - {len(self.files)} 条")
+        self.root.configure(bg="black")
+        bar = tk.Frame(self.root, bg="black")
+        bar.pack(fill="x")
+        for value in tool.classes:
+            tk.Button(bar, text=f"所选标为 {value}", takefocus=0,
+                      command=lambda v=value: self.label_selected(v)).pack(side="left", padx=4, pady=4)
+        self.play_on_hover = tk.BooleanVar(value=False)
+        tk.Checkbutton(bar, text="悬停播放", variable=self.play_on_hover, fg="white", bg="black",
+                       selectcolor="black", takefocus=0).pack(side="left", padx=8)
+        self.status_var = tk.StringVar(
+            value="单击选择，Shift 单击连选，Ctrl+A 全选可见未标注，Esc 取消；标注键批量标注，播放键试听鼠标所在音频")
+        tk.Label(self.root, textvariable=self.status_var, fg="#adb5bd", bg="black").pack(fill="x")
+
+        body = tk.Frame(self.root, bg="black")
+        body.pack(fill="both", expand=True)
+        self.canvas = tk.Canvas(body, bg="black", highlightthickness=0, width=COLUMNS * CELL_W,
+                                height=VISIBLE_ROWS * CELL_H, scrollregion=(0, 0, COLUMNS * CELL_W, self.rows * CELL_H))
+        self.scroll = tk.Scrollbar(body, orient="vertical", command=self.on_scroll)
+        self.canvas.configure(yscrollcommand=self.scroll.set)
+        self.scroll.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Shift-Button-1>", lambda e: self.on_click(e, extend=True))
+        self.canvas.bind("<Motion>", self.on_motion)
+        self.canvas.bind("<Leave>", lambda e: self.set_hover(None))
+        # Linux 下滚轮为 Button-4/5
+        self.canvas.bind("<MouseWheel>", lambda e: self.on_scroll("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.on_scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.on_scroll("scroll", 1, "units"))
+        self.canvas.configure(yscrollincrement=CELL_H // 2)
+
+        # 标注与播放沿用主窗口的快捷键
+        for value in tool.classes:
+            for key in tool.keymap.get(f"label_{value}", []):
+                self.root.bind(f"<KeyPress-{key}>", lambda e, v=value: self.on_key(self.label_selected, v))
+        for key in tool.keymap.get("play_pause", []):
+            self.root.bind(f"<KeyPress-{key}>", lambda e: self.on_key(self.toggle_play))
+        self.root.bind("<Control-a>", lambda e: self.select_visible())
+        self.root.bind("<Escape>", lambda e: self.clear_selection())
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # 从主窗口当前音频所在行开始
+        if self.rows:
+            self.canvas.yview_moveto(tool.current_index // COLUMNS / self.rows)
+        self.root.focus_set()
+
+    def on_key(self, command, *args):
+        command(*args)
+        return "break"  # 不再交给获得焦点的按钮等控件处理
+
+    # ===== 可见范围 =====
+
+    def on_scroll(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def visible_range(self, margin=0):
+        top = self.canvas.canvasy(0)
+        first_row = max(int(top // CELL_H) - margin, 0)
+        last_row = int((top + self.canvas.winfo_height()) // CELL_H) + margin
+        return range(first_row * COLUMNS, min((last_row + 1) * COLUMNS, len(self.files)))
+
+    def refresh(self):
+        """画出进入可见范围的格子，删除离开的格子并取消其尚未开始的缩略图任务"""
+        if self.closed:
+            return
+        visible = self.visible_range(MARGIN_ROWS)
+        for index in [i for i in self.drawn if i not in visible]:
+            for item in self.drawn.pop(index):
+                self.canvas.delete(item)
+            self.photos.pop(index, None)
+            future = self._jobs.pop(index, None)
+            if future is not None:
+                future.cancel()
+        for index in visible:
+            if index not in self.drawn:
+                self.draw_tile(index)
+
+    def draw_tile(self, index):
+        x = index % COLUMNS * CELL_W + PAD
+        y = index // COLUMNS * CELL_H + PAD
+        w, h = THUMB_SIZE
+        frame = self.canvas.create_rectangle(x - 3, y - 3, x + w + 3, y + h + 3, width=3)
+        image = self.canvas.create_image(x, y, anchor="nw")
+        caption = self.canvas.create_text(x, y + h + 4, anchor="nw", fill="white", font=("Arial", 9))
+        self.drawn[index] = (frame, image, caption)
+        self.update_tile(index)
+        self.request_thumbnail(index)
+
+    def update_tile(self, index):
+        """按选中 / 悬停 / 已标注状态更新边框与文字"""
+        frame, _, caption = self.drawn[index]
+        name = self.files[index]
+        label_value = self.label_of(name)
+        if index in self.selected:
+            state = "selected"
+        elif index == self.hover:
+            state = "hover"
+        else:
+            state = "normal" if label_value is None else "labelled"
+        self.canvas.itemconfig(frame, outline=OUTLINE[state])
+        text = name if len(name) <= 24 else name[:21] + "…"
+        if label_value is not None:
+            text = f"[{label_value}] {text}"
+        self.canvas.itemconfig(caption, text=text, fill="white" if label_value is None else "#adb5bd")
+
+    def label_of(self, name):
+        label_value = self.labels.get(name)
+        return label_value if label_value is not None else self.tool.label_store.get(name)
+
+    # ===== 缩略图 =====
+
+    def request_thumbnail(self, index):
+        name = self.files[index]
+        audio_path = os.path.join(self.tool.audio_folder, name)
+        stem = os.path.splitext(name)[0]
+        spec_path = os.path.join(self.tool.spec_folder, stem + ".png")
+        thumb_path = os.path.join(self.thumbs_folder, stem + ".png")
+        future = self._executor.submit(load_thumbnail, audio_path, spec_path, thumb_path)
+        self._jobs[index] = future
+        self.tool.ui.when_done(future, self.on_thumbnail, index)
+
+    def on_thumbnail(self, index, future):
+        if self.closed or self._jobs.get(index) is not future:
+            return  # 格子已滚出可见范围
+        del self._jobs[index]
+        if future.exception() is not None:
+            self.canvas.itemconfig(self.drawn[index][2], text=f"[无法解码] {self.files[index]}")
+            return
+        photo = ImageTk.PhotoImage(future.result())
+        self.photos[index] = photo
+        self.canvas.itemconfig(self.drawn[index][1], image=photo)
+
+    # ===== 选择 =====
+
+    def index_at(self, event):
+        col = int(self.canvas.canvasx(event.x) // CELL_W)
+        index = int(self.canvas.canvasy(event.y) // CELL_H) * COLUMNS + col
+        return index if 0 <= col < COLUMNS and 0 <= index < len(self.files) else None
+
+    def on_click(self, event, extend=False):
+        index = self.index_at(event)
+        if index is None:
+            return
+        if extend and self.anchor is not None:
+            lo, hi = sorted((self.anchor, index))
+            changed = set(range(lo, hi + 1)) - self.selected
+            self.selected |= changed
+        else:
+            changed = {index}
+            self.selected ^= changed
+            self.anchor = index
+        for i in changed:
+            if i in self.drawn:
+                self.update_tile(i)
+        self.status_var.set(f"已选择 {len(self.selected)} 条")
+
+    def select_visible(self):
+        """选中当前可见范围内所有未标注的格子"""
+        changed = {i for i in self.visible_range() if self.label_of(self.files[i]) is None} - self.selected
+        self.selected |= changed
+        for i in changed:
+            self.update_tile(i)
+        self.status_var.set(f"已选择 {len(self.selected)} 条")
+
+    def clear_selection(self):
+        changed, self.selected = self.selected, set()
+        for i in changed:
+            if i in self.drawn:
+                self.update_tile(i)
+        self.status_var.set("已取消选择")
+
+    def label_selected(self, label_value):
+        """把所选格子（未选择时为鼠标所在格子）批量写入标注"""
+        indices = sorted(self.selected) if self.selected else ([self.hover] if self.hover is not None else [])
+        if not indices:
+            return
+        tool = self.tool
+        names = [self.files[i] for i in indices]
+        positions = {name: i for i, name in enumerate(tool.audio_files)}
+        for name in names:
+            tool.label_writer.put(name, label_value, 1.0)
+            self.labels[name] = label_value
+            if name in positions:
+                tool.unlabelled.mark_labelled(positions[name])
+        if tool.session is not None:
+            tool.session.log_events(names, "gallery")
+        self.selected.clear()
+        for i in indices:
+            if i in self.drawn:
+                self.update_tile(i)
+        self.status_var.set(f"已把 {len(names)} 条标注为 {label_value}")
+
+    # ===== 试听 =====
+
+    def on_motion(self, event):
+        self.set_hover(self.index_at(event))
+
+    def set_hover(self, index):
+        if index == self.hover:
+            return
+        previous, self.hover = self.hover, index
+        for i in (previous, index):
+            if i is not None and i in self.drawn:
+                self.update_tile(i)
+        if self.hover_timer is not None:
+            self.root.after_cancel(self.hover_timer)
+            self.hover_timer = None
+        if index is not None and self.play_on_hover.get():
+            self.hover_timer = self.root.after(HOVER_PLAY_MS, self.play, index)
+
+    def toggle_play(self):
+        index = self.hover if self.hover is not None else self.anchor
+        if index is None:
+            return
+        if index == self.playing and self.tool.playback.state == self.tool.playback.PLAYING:
+            self.tool.playback.stop()
+            self.playing = None
+        else:
+            self.play(index)
+
+    def play(self, index):
+        self.hover_timer = None
+        tool = self.tool
+        # 主窗口的语谱图与播放光标不再对应正在播放的音频，关闭网格时重新加载
+        tool.audio_ready = False
+        try:
+            tool.playback.load(os.path.join(tool.audio_folder, self.files[index]))
+        except (OSError, RuntimeError) as e:  # 已删除或无法解码的音频：提示后跳过，与主窗口 show_clip 一致
+            tool.player.close()
+            self.playing = None
+            self.status_var.set(f"{self.files[index]}: 音频无法打开: {e}")
+            return
+        tool.playback.play()
+        self.playing = index
+        self.status_var.set(f"播放: {self.files[index]}")
+        if tool.session is not None:
+            tool.session.log_event(self.files[index], "play")
+
+    def close(self):
+        self.closed = True
+        if self.hover_timer is not None:
+            self.root.after_cancel(self.hover_timer)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+        self.tool.on_gallery_closed()
@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def image_nbytes(img):
+    """PIL 图像解码后占用的大致字节数"""
+    return img.width * img.height * len(img.getbands())
+
+
+class ImageCache:
+    """已缩放语谱图的 LRU 缓存，按 (路径, 修改时间, 目标尺寸) 索引，总字节数不超过 max_bytes。
+
+    可在多个工作线程中同时使用。
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> PIL.Image
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, size, resample=None):
+        """返回缩放到 size 的图像；文件不存在时返回 None"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (path, mtime, tuple(size))
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+
+        # 解码放在锁外，避免阻塞其他线程的命中
+        with Image.open(path) as src:
+            img = src.resize(size) if resample is None else src.resize(size, resample)
+        self.put(key, img)
+        return img
+
+    def put(self, key, img):
+        nbytes = image_nbytes(img)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= image_nbytes(old)
+            if nbytes > self.max_bytes:
+                return
+            self._items[key] = img
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= image_nbytes(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回 (命中, 未命中, 条目数, 占用字节)"""
+        with self._lock:
+            return self.hits, self.misses, len(self._items), self._bytes
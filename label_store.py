@@ -0,0 +1,217 @@
+import csv
+import os
+import queue
+import threading
+
+
+class JournalStore:
+    """CSV 加追加日志的存储基类：内存中维护全部记录，每次修改只向日志追加一行，
+    日志条数达到阈值时在后台线程合并回 CSV，退出时再合并一次。启动时读入 CSV 并重放日志。
+
+    子类定义 HEADER（CSV 表头）并实现：
+    - _load_row(row)：读入 CSV 的一行（dict）
+    - _replay_row(row)：重放日志的一行（list）；崩溃时写了一半的行应直接忽略
+    - _rows()：当前全部记录，按写回 CSV 的行序（在 _lock 内调用）
+    修改内存记录与 _log 应在同一次持有 _lock 时完成，合并时才不会漏掉或重复一条修改。
+    """
+
+    HEADER = None
+
+    def __init__(self, csv_path, compact_every):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._compact_thread = None
+        self._load()
+        self._journal = open(self.journal_path, "a", newline="", encoding="utf-8")
+
+    def _load(self):
+        if os.path.exists(self.csv_path):
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self._load_row(row)
+        # 上次合并中途退出时可能残留 .old，先于当前日志重放
+        for path in (self.journal_path + ".old", self.journal_path):
+            if os.path.exists(path):
+                with open(path, newline="", encoding="utf-8") as f:
+                    for row in csv.reader(f):
+                        self._replay_row(row)
+                self._pending += 1
+
+    def _log(self, row, flush=True):
+        """向日志追加一行，O(1)；达到阈值时在后台线程合并"""
+        with self._lock:
+            csv.writer(self._journal).writerow(row)
+            if flush:
+                self._journal.flush()
+            self._pending += 1
+            need_compact = (self._pending >= self.compact_every
+                            and (self._compact_thread is None or not self._compact_thread.is_alive()))
+            if need_compact:
+                self._compact_thread = threading.Thread(target=self.compact, daemon=True)
+                self._compact_thread.start()
+
+    def flush(self):
+        with self._lock:
+            self._journal.flush()
+
+    def compact(self):
+        """把当前记录整体写回 CSV，并清空日志"""
+        with self._lock:
+            if self._pending == 0:
+                return
+            rows = self._rows()
+            # 轮换日志：合并期间的新修改写入新日志，不会丢失
+            self._journal.close()
+            os.replace(self.journal_path, self.journal_path + ".old")
+            self._journal = open(self.journal_path, "a", newline="", encoding="utf-8")
+            self._pending = 0
+
+        tmp_path = self.csv_path + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.HEADER)
+            writer.writerows(rows)
+        os.replace(tmp_path, self.csv_path)
+        os.remove(self.journal_path + ".old")
+
+    def close(self):
+        """退出时调用：等待后台合并结束，再做最后一次合并"""
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+        self.compact()
+        with self._lock:
+            self._journal.close()
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) == 0:
+            os.remove(self.journal_path)
+
+
+class LabelStore(JournalStore):
+    """标注存储：内存中维护 文件→标签 索引，日志每行为 file,label。"""
+
+    HEADER = ["file", "label"]
+
+    def __init__(self, csv_path, compact_every=1000):
+        self._labels = {}  # file -> label，字典顺序即写回 CSV 的行序
+        super().__init__(csv_path, compact_every)
+
+    # ===== 读取 =====
+
+    def _load_row(self, row):
+        if row.get("file"):
+            self._labels[row["file"]] = row.get("label", "")
+
+    def _replay_row(self, row):
+        if len(row) != 2 or not row[1]:  # 崩溃时写了一半的行（如 "a.wav,"）直接丢弃
+            return
+        self._labels.pop(row[0], None)
+        self._labels[row[0]] = row[1]
+
+    def _rows(self):
+        return list(self._labels.items())
+
+    def __contains__(self, file_name):
+        return file_name in self._labels
+
+    def __len__(self):
+        return len(self._labels)
+
+    def get(self, file_name, default=None):
+        return self._labels.get(file_name, default)
+
+    def labelled_files(self):
+        """已标注文件名集合（快照）"""
+        with self._lock:
+            return set(self._labels)
+
+    # ===== 写入 =====
+
+    def set(self, file_name, label, flush=True, confidence=None):
+        """记录一条标注，O(1)：更新索引并向日志追加一行（CSV 格式不保存置信度）"""
+        with self._lock:
+            self._labels.pop(file_name, None)  # 与旧实现一致：重新标注的行移到末尾
+            self._labels[file_name] = label
+            self._log([file_name, label], flush)
+
+
+class LabelWriter:
+    """专用写线程：标注经队列交给后台写入，界面线程不做任何磁盘 I/O。
+
+    队列中积压的多条标注合并为一次 flush。on_flushed(items) 在写线程中调用，
+    items 为本批已落盘的 (文件, 标签, 置信度) 列表；它不能触碰 Tk，
+    界面应把结果放入 UiQueue 之类的线程安全队列，由 Tk 线程取出处理。
+    """
+
+    def __init__(self, store, on_flushed=None):
+        self.store = store
+        self.on_flushed = on_flushed
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, file_name, label, confidence=None):
+        self._queue.put((file_name, label, confidence))
+
+    def close(self):
+        """写完队列中剩余的标注后退出。on_flushed 只向队列投递、不等待 Tk 线程，join 不会互相等待"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            items = [item for item in items if item is not None]
+            for file_name, label, confidence in items:
+                self.store.set(file_name, label, flush=False, confidence=confidence)
+            if items:
+                self.store.flush()
+                on_flushed = self.on_flushed  # 只读一次，其他线程同时修改也不会在判空与调用之间变为 None
+                if on_flushed is not None:
+                    on_flushed(items)
+            if stop:
+                return
+
+
+class UnlabelledIndex:
+    """在文件列表中查找下一个未标注条目。
+
+    已标注的位置指向下一个位置，查找时做路径压缩，
+    连续跳过大量已标注条目的均摊代价接近 O(1)。
+    """
+
+    def __init__(self, files, labelled):
+        self._count = len(files)
+        # _next[i] == i 表示第 i 条未标注；末尾多一个哨兵
+        self._next = [i + 1 if name in labelled else i for i, name in enumerate(files)]
+        self._next.append(self._count)
+
+    def mark_labelled(self, index):
+        self._next[index] = index + 1
+
+    def is_labelled(self, index):
+        return self._next[index] != index
+
+    def _find(self, index):
+        root = index
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[index] != root:  # 路径压缩
+            self._next[index], index = root, self._next[index]
+        return root
+
+    def next_unlabelled(self, start):
+        """从 start（含）开始循环查找第一个未标注位置，全部已标注时返回 None"""
+        if self._count == 0:
+            return None
+        index = self._find(start % self._count)
+        if index == self._count:
+            index = self._find(0)
+        return index if index < self._count else None
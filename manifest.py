@@ -0,0 +1,83 @@
+import json
+import os
+
+from file_index import save_cache
+
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+
+
+def scan_folder(folder, extensions):
+    """用 os.scandir 列出目录下指定扩展名的文件名（已排序）"""
+    with os.scandir(folder) as it:
+        names = [entry.name for entry in it
+                 if entry.name.lower().endswith(extensions) and entry.is_file()]
+    names.sort()
+    return names
+
+
+class Manifest:
+    """数据集清单：audio/ 与 spectrogram/ 的文件列表保存在数据集目录下的 manifest.json 中。
+
+    重新打开数据集时只比较两个目录的修改时间，未变化的目录直接复用上次的列表，
+    因此大目录也无需重新扫描与排序。同时记录缺少对应 PNG 的音频。
+    """
+
+    FILE_NAME = "manifest.json"
+
+    def __init__(self, dataset_folder, audio_folder, spec_folder):
+        self.path = os.path.join(dataset_folder, self.FILE_NAME)
+        self.audio_folder = audio_folder
+        self.spec_folder = spec_folder
+        self.audio_files = []
+        self.spec_stems = set()
+        self.missing_spectrograms = []
+        self._data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+
+    def refresh(self):
+        """按目录修改时间增量刷新，返回清单是否有变化"""
+        audio, audio_changed = self._refresh_folder("audio", self.audio_folder, AUDIO_EXTENSIONS)
+        spec, spec_changed = self._refresh_folder("spectrogram", self.spec_folder, (".png",))
+        self.audio_files = audio
+        self.spec_stems = {os.path.splitext(name)[0] for name in spec}
+        if audio_changed or spec_changed or "missing" not in self._data:
+            self._data["missing"] = [name for name in audio
+                                     if os.path.splitext(name)[0] not in self.spec_stems]
+            self._save()
+        self.missing_spectrograms = self._data["missing"]
+        return audio_changed or spec_changed
+
+    def has_spectrogram(self, audio_name):
+        return os.path.splitext(audio_name)[0] in self.spec_stems
+
+    def add_spectrogram(self, audio_name):
+        """语谱图在本次会话中生成后更新内存中的清单（下次打开时由目录时间触发重扫）"""
+        self.spec_stems.add(os.path.splitext(audio_name)[0])
+
+    # ===== 内部实现 =====
+
+    def _refresh_folder(self, key, folder, extensions):
+        if not os.path.isdir(folder):
+            self._data.pop(key, None)
+            return [], False
+        mtime = os.stat(folder).st_mtime_ns
+        entry = self._data.get(key)
+        if entry is not None and entry.get("folder") == folder and entry.get("mtime_ns") == mtime:
+            return entry["files"], False
+        files = scan_folder(folder, extensions)
+        self._data[key] = {"folder": folder, "mtime_ns": mtime, "files": files}
+        return files, True
+
+    def _save(self):
+        self._data["version"] = 1
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, separators=(",", ":"))
+
+        save_cache(self.path, write)
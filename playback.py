@@ -0,0 +1,360 @@
+import queue
+import threading
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+from timestretch import MAX_RATE, MIN_RATE, make_stretcher
+from wavmap import open_audio
+
+
+class StreamPlayer:
+    """流式播放引擎：sounddevice.OutputStream 回调中按块从 soundfile 读取，不整体加载音频。
+
+    位置以帧为单位在回调中累加，暂停、继续与跳转都不需要重新打开文件。
+    rate 不为 1 时由渲染线程按块读取并变速（WSOLA 保持音高或重采样变调），
+    回调只从队列中取出已处理好的块，位置仍按原音频的帧计算。
+    on_finished 在音频自然播放结束时于 PortAudio 线程中调用，不能直接操作 Tk 控件。
+    """
+
+    def __init__(self, blocksize=2048, on_finished=None):
+        self.blocksize = blocksize
+        self.on_finished = on_finished
+        self.samplerate = 0
+        self.channels = 0
+        self.frames = 0
+        self._file = None
+        self._stream = None
+        self._position = 0  # 已交给声卡的帧数
+        self._clock = None  # 最近一块的 (DAC 播放时刻, 块起始帧)，用于插值出正在发声的位置
+        self._ended = False
+        self._lock = threading.Lock()
+        self.rate = 1.0
+        self.preserve_pitch = True
+        self._generation = 0     # 每次跳转加一，渲染线程与回调据此丢弃过期的块
+        self._render_thread = None
+        self._render_stop = None
+        self._queue = None       # (代号, 输出块, 起始源帧, 结束源帧, 是否结尾)
+        self._current = None     # 回调正在输出的块及偏移
+
+    # ===== 打开 =====
+
+    def load(self, source):
+        """打开音频（文件路径或类文件对象），停在开头。PCM WAV 路径走内存映射，不解码整个文件"""
+        self.stop_stream()
+        new_file = open_audio(source) if isinstance(source, str) else sf.SoundFile(source)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = new_file
+            self._position = 0
+            self._clock = None
+            self._ended = False
+            self.frames = new_file.frames
+        # 采样率与声道数不变时复用已打开的输出流，切换音频不必重新初始化声卡
+        if (self._stream is None or self.samplerate != new_file.samplerate
+                or self.channels != new_file.channels):
+            if self._stream is not None:
+                self._stream.close()
+            self.samplerate = new_file.samplerate
+            self.channels = new_file.channels
+            self._stream = sd.OutputStream(samplerate=self.samplerate, channels=self.channels,
+                                           dtype="float32", blocksize=self.blocksize,
+                                           callback=self._callback, finished_callback=self._finished)
+
+    def close(self):
+        self.stop_stream()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.frames = 0
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    # ===== 控制 =====
+
+    @property
+    def active(self):
+        return self._stream is not None and self._stream.active
+
+    def play(self):
+        """从当前位置开始播放；已播放到结尾时从头开始"""
+        if self._file is None or self.active:
+            return
+        self.stop_stream()  # 上次自然结束后须先停止流才能重新启动
+        if self._position >= self.frames:
+            self.seek(0)
+        with self._lock:
+            self._file.seek(self._position)  # 渲染线程可能已预读到更后面
+            self._clock = None
+        self._ended = False
+        if self.rate != 1.0:
+            self._start_renderer()
+        self._stream.start()
+
+    def pause(self):
+        self.stop_stream()
+
+    def stop(self):
+        self.stop_stream()
+        if self._file is not None:
+            self.seek(0)
+
+    def stop_stream(self):
+        if self._stream is not None and not self._stream.stopped:
+            self._stream.stop()
+        self._stop_renderer()
+
+    def set_rate(self, rate, preserve_pitch=True):
+        """设置播放速率（MIN_RATE–MAX_RATE 倍），播放中调用时从当前位置以新速率继续"""
+        rate = min(max(float(rate), MIN_RATE), MAX_RATE)
+        if rate == self.rate and preserve_pitch == self.preserve_pitch:
+            return
+        playing = self.active
+        self.stop_stream()
+        self.rate = rate
+        self.preserve_pitch = preserve_pitch
+        if playing:
+            self.play()
+
+    def seek(self, seconds):
+        """跳转到指定秒数，播放中也可调用"""
+        if self._file is None:
+            return
+        frame = min(max(int(seconds * self.samplerate), 0), self.frames)
+        with self._lock:
+            self._file.seek(frame)
+            self._position = frame
+            self._clock = None
+            self._generation += 1
+            self._current = None
+
+    @property
+    def position(self):
+        """当前播放位置（秒），对应真正听到的位置。
+
+        播放中按最近一块的 DAC 时刻与流时钟插值，精度不受块大小限制；
+        声卡不提供 DAC 时刻时退回为扣除输出延迟的估计。
+        """
+        if not self.samplerate:
+            return 0.0
+        with self._lock:
+            frames = self._position
+            clock = self._clock
+        if self.active:
+            if clock is not None:
+                dac_time, block_start = clock
+                heard = block_start + (self._stream.time - dac_time) * self.samplerate * self.rate
+                frames = min(heard, frames)
+            else:
+                frames -= self._stream.latency * self.samplerate * self.rate
+        return max(frames, 0) / self.samplerate
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate if self.samplerate else 0.0
+
+    @property
+    def ended(self):
+        """是否已自然播放到结尾（由流回调置位）"""
+        return self._ended
+
+    # ===== 回调（PortAudio 线程） =====
+
+    def _callback(self, outdata, frames, time, status):
+        if self._queue is not None:
+            self._stretched_callback(outdata, frames, time)
+            return
+        with self._lock:
+            if time.outputBufferDacTime:
+                self._clock = (time.outputBufferDacTime, self._position)
+            data = self._file.read(frames, dtype="float32", always_2d=True)
+            n = len(data)
+            outdata[:n] = data
+            self._position += n
+        if n < frames:
+            outdata[n:] = 0
+            self._ended = True
+            raise sd.CallbackStop
+
+    def _stretched_callback(self, outdata, frames, time):
+        """变速播放：从渲染队列取块填充，队列暂时为空时输出静音而不阻塞"""
+        filled = 0
+        end = False
+        with self._lock:
+            if time.outputBufferDacTime:
+                self._clock = (time.outputBufferDacTime, self._position)
+            while filled < frames:
+                if self._current is None:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item[0] != self._generation:
+                        continue
+                    self._current = [item, 0]
+                (_, data, src_start, src_stop, last), offset = self._current
+                n = min(frames - filled, len(data) - offset)
+                outdata[filled:filled + n] = data[offset:offset + n]
+                filled += n
+                offset += n
+                if len(data):
+                    self._position = src_start + (src_stop - src_start) * offset // len(data)
+                if offset < len(data):
+                    self._current[1] = offset
+                    continue
+                self._current = None
+                if last:
+                    self._position = src_stop
+                    end = True
+                    break
+        if filled < frames:
+            outdata[filled:] = 0
+        if end:
+            self._ended = True
+            raise sd.CallbackStop
+
+    def _start_renderer(self):
+        self._queue = queue.Queue(maxsize=8)
+        self._current = None
+        self._render_stop = threading.Event()
+        self._render_thread = threading.Thread(target=self._render_loop, args=(self._render_stop,), daemon=True)
+        self._render_thread.start()
+
+    def _stop_renderer(self):
+        if self._render_thread is None:
+            return
+        self._render_stop.set()
+        self._render_thread.join()
+        self._render_thread = None
+        self._queue = None
+        self._current = None
+
+    def _render_loop(self, stop):
+        """渲染线程：按块读取源音频并变速，放入有界队列（约 8 块的预读）"""
+        generation = None
+        stretcher = base = None
+        while not stop.is_set():
+            with self._lock:
+                if generation != self._generation:
+                    generation = self._generation
+                    stretcher = make_stretcher(self.rate, self.channels, self.samplerate, self.preserve_pitch)
+                    base = self._file.tell()
+                data = self._file.read(self.blocksize, dtype="float32", always_2d=True)
+            last = len(data) < self.blocksize
+            src_start = base + stretcher.position
+            out = stretcher.process(np.ascontiguousarray(data, dtype=np.float32), final=last)
+            item = (generation, out, src_start, base + stretcher.position, last)
+            while not stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.05)
+                    break
+                except queue.Full:
+                    pass
+            if last:
+                # 已到结尾：等待跳转（代号变化）或停止
+                while not stop.is_set() and generation == self._generation:
+                    stop.wait(0.05)
+
+    def _finished(self):
+        if self._ended and self.on_finished is not None:
+            self.on_finished()
+
+
+class PlaybackController:
+    """播放状态机（idle / playing / paused），所有事件回调都在 Tk 线程中执行。
+
+    只有播放期间才按 interval_ms 调度刷新，空闲与暂停时不注册任何定时器；
+    流回调在结尾处置位 ended，下一次刷新时发出结束事件，Tk 控件不会被其他线程访问。
+    """
+
+    IDLE = "idle"
+    PLAYING = "playing"
+    PAUSED = "paused"
+
+    def __init__(self, root, player, interval_ms=100):
+        self.root = root
+        self.player = player
+        self.interval_ms = interval_ms
+        self.state = self.IDLE
+        self.on_state = None     # on_state(state)
+        self.on_position = None  # on_position(秒)
+        self.on_end = None       # on_end()
+        self._timer = None
+
+    def load(self, source):
+        self.stop()
+        self.player.load(source)
+        self._emit_position(0.0)
+
+    def toggle(self):
+        if self.state == self.PLAYING:
+            self.pause()
+        else:
+            self.play()
+
+    def play(self):
+        if self.state == self.PLAYING:
+            return
+        self.player.play()
+        self._set_state(self.PLAYING)
+        self._schedule()
+
+    def pause(self):
+        if self.state != self.PLAYING:
+            return
+        self.player.pause()
+        self._cancel()
+        self._set_state(self.PAUSED)
+        self._emit_position(self.player.position)
+
+    def stop(self):
+        self.player.stop()
+        self._cancel()
+        self._set_state(self.IDLE)
+
+    def seek(self, seconds):
+        self.player.seek(seconds)
+        self._emit_position(self.player.position)
+
+    def set_rate(self, rate, preserve_pitch=True):
+        """改变播放速率，不改变播放状态"""
+        self.player.set_rate(rate, preserve_pitch)
+
+    def close(self):
+        self._cancel()
+        self.player.close()
+
+    # ===== 内部实现 =====
+
+    def _schedule(self):
+        self._timer = self.root.after(self.interval_ms, self._tick)
+
+    def _cancel(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def _tick(self):
+        self._timer = None
+        if self.player.ended or not self.player.active:
+            self._set_state(self.IDLE)
+            self._emit_position(self.player.duration)
+            if self.on_end is not None:
+                self.on_end()
+            return
+        self._emit_position(self.player.position)
+        self._schedule()
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            if self.on_state is not None:
+                self.on_state(state)
+
+    def _emit_position(self, seconds):
+        if self.on_position is not None:
+            self.on_position(seconds)
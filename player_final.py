@@ -1,14 +1,92 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import argparse
+import getpass
+import io
+import json
+import multiprocessing
 import os
-from PIL import Image, ImageTk
-import pygame
-import pandas as pd
+import threading
+import time
+from PIL import ImageTk
+from active_learning import ActiveLearner
+from annotations import DEFAULT_CLASSES, open_label_store
+from audio_info import DurationIndex
+from features import FEATURES, FeatureIndex, feature_label
+from fingerprint import FingerprintIndex
+from gallery import Gallery
+from image_cache import ImageCache
+from label_store import LabelStore, LabelWriter, UnlabelledIndex
+from manifest import Manifest
+from playback import PlaybackController, StreamPlayer
+from prefetch import Prefetcher
+from pyramid import FIRST_BIN, PYRAMID_MIN_SECONDS, Pyramid, pyramid_up_to_date, tiles_dir
+from segments import Segment, SegmentStore
+from session_db import SESSION_FILE, SessionDB
+from spectrogram import SpectrogramEngine, hz_to_row, row_to_hz
+from triage import load_proposals
+from ui_queue import UiQueue
+
+# 默认快捷键（Tk keysym），可在工作目录下的 hotkeys.json 中按动作名覆盖；
+# 其他类别 label_<类别> 未配置时，单字符类别名即为快捷键
+DEFAULT_KEYMAP = {
+    "label_1": ["1"],
+    "label_0": ["0"],
+    "play_pause": ["space"],
+    "prev": ["Left"],
+    "next": ["Right"],
+    "next_unlabelled": ["Down", "n"],
+    "speed_down": ["bracketleft"],
+    "speed_up": ["bracketright"],
+}
+HOTKEY_FILE = "hotkeys.json"
+NAV_DEBOUNCE_MS = 150  # 连续翻页间隔小于此值时只加载最后停下的那一条
+SPEC_SIZE = (800, 500)  # 语谱图显示尺寸，区间标注的坐标换算以此为准
+MIN_DRAG_PX = 4  # 拖动距离小于此值视为单击，不创建区间
+MIN_VIEW_SECONDS = 1.0  # 长录音最大放大到画布宽度显示 1 秒
+ZOOM_STEP = 1.25
+PLAYHEAD_INTERVAL_MS = 33  # 播放期间约 30 fps 刷新播放光标
+RATE_STEPS = (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0)
+TRIAGE_REASONS = {"silent": "静音", "stationary": "平稳噪声"}
+
+
+def load_keymap(path=HOTKEY_FILE):
+    """返回 (快捷键表, 警告或 None)；hotkeys.json 无法解析或格式不对时使用默认快捷键"""
+    keymap = {action: list(keys) for action, keys in DEFAULT_KEYMAP.items()}
+    if not os.path.exists(path):
+        return keymap, None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("顶层应为 {动作: 按键} 对象")
+        overrides = {}
+        for action, keys in data.items():
+            keys = [keys] if isinstance(keys, str) else keys
+            if not isinstance(keys, list) or not all(isinstance(k, str) and k for k in keys):
+                raise ValueError(f"{action} 的按键应为字符串或字符串列表")
+            overrides[action] = list(keys)
+    except (OSError, ValueError) as e:  # json.JSONDecodeError 是 ValueError 的子类
+        return keymap, f"{path} 无效，已使用默认快捷键: {e}"
+    keymap.update(overrides)
+    return keymap, None
+
+
+def is_text_input(widget):
+    """可编辑的输入框（Entry、非只读 Combobox）获得焦点时，按键应输入文字而不是触发快捷键"""
+    return isinstance(widget, (tk.Entry, ttk.Entry)) and str(widget.cget("state")) != "readonly"
+
+
+def disable_focus(widget):
+    """按钮与复选框不参与键盘焦点：否则空格等快捷键会同时触发获得焦点的按钮"""
+    for child in widget.winfo_children():
+        if isinstance(child, (tk.Button, ttk.Button, tk.Checkbutton, ttk.Checkbutton)):
+            child.configure(takefocus=0)
+        disable_focus(child)
 
-pygame.mixer.init()
 
 class AudioLabelTool:
-    def __init__(self, root):
+    def __init__(self, root, output_file="labels.csv", annotator=None, classes=DEFAULT_CLASSES, use_session=False):
         self.root = root
         self.root.title("音频标注工具")
         self.root.geometry("1200x700")
@@ -17,8 +95,50 @@ class AudioLabelTool:
         self.spec_folder = ""
         self.audio_files = []
         self.current_index = 0
-        self.is_playing = False
-        self.output_file = "labels.csv"
+        self.output_file = output_file
+        self.annotator = annotator or getpass.getuser()
+        self.classes = [str(c) for c in classes]
+        # .csv 为单人 CSV；.db/.sqlite 为多人 SQLite 库（记录标注员、时间与置信度）
+        self.label_store = open_label_store(self.output_file, self.annotator, self.classes)
+        # 工作线程的结果一律经此队列交回 Tk 线程，任何其他线程都不直接调用 Tk
+        self.ui = UiQueue(self.root)
+        self.label_writer = self.make_label_writer()
+        # 会话库模式：打开数据集后标注、清单、时长与浏览历史改存到 <数据集>/session.db
+        self.use_session = use_session
+        self.session = None
+        self.image_cache = ImageCache(max_bytes=256 * 1024 * 1024)
+        self.spec_engine = SpectrogramEngine(workers=2)
+        self.prefetcher = Prefetcher(self.ui, size=SPEC_SIZE, window=3,
+                                     cache=self.image_cache, engine=self.spec_engine)
+        self.current_audio_path = ""
+        self.audio_ready = False
+        self.player = StreamPlayer()
+        # 事件驱动的播放控制：只在播放期间刷新进度与播放光标，空闲时没有定时器
+        self.playback = PlaybackController(self.root, self.player, interval_ms=PLAYHEAD_INTERVAL_MS)
+        self.playback.on_state = self.on_playback_state
+        self.playback.on_position = self.on_playback_position
+        self.manifest = None
+        self.unlabelled = None
+        self.durations = None
+        self.features = None
+        self.learner = None
+        self.proposals = {}  # 预筛建议 {文件名: (标签, 原因)}，见 triage.py
+        self.fingerprints = None
+        self.duplicates = {}  # 近重复组 {文件名: 同组全部文件}，见 fingerprint.py
+        self.last_saved = None  # (文件名, 标签)，写线程落盘前也能取到刚标注的标签
+        self.gallery = None
+        self.current_duration = 0.0
+        # 区间标注（起止时间 + 可选频带），与整段标注分开存放
+        self.segments = SegmentStore(os.path.splitext(self.output_file)[0] + "_segments.csv")
+        self.drag = None
+        # 可见时间窗：短音频固定为整段；长录音由瓦片金字塔按画布尺寸渲染，可缩放与横向滚动
+        self.pyramid = None
+        self.spec_layout = None  # 单张语谱图的行布局；数据集自带的 PNG 布局未知，为 None
+        self.view_start = 0.0
+        self.view_span = 0.0
+        self.view_size = SPEC_SIZE
+        self.pending_view = None
+        self.closed = False
 
         # 样式设置
         style = ttk.Style()
@@ -34,6 +154,8 @@ class AudioLabelTool:
         style.map("Yes.TButton", background=[('active', '#0069d9'), ('pressed', '#0056b3')])
         style.configure("No.TButton", background="#dc3545")
         style.map("No.TButton", background=[('active', '#c82333'), ('pressed', '#bd2130')])
+        style.configure("Class.TButton", background="#6f42c1")
+        style.map("Class.TButton", background=[('active', '#5a32a3'), ('pressed', '#4e2d8c')])
 
         # 布局
         self.frame_left = tk.Frame(root, width=800, height=700, bg="black")
@@ -41,9 +163,28 @@ class AudioLabelTool:
         self.frame_right = tk.Frame(root, width=400, bg="#f8f9fa")
         self.frame_right.pack(side="right", fill="y")
 
-        # 显示语谱图
-        self.label_img = tk.Label(self.frame_left, bg="black")
-        self.label_img.pack(fill="both", expand=True)
+        # 显示语谱图：单击跳转播放位置，拖动框选时间区间，按住 Shift 拖动同时框选频带，右键删除区间
+        self.canvas = tk.Canvas(self.frame_left, bg="black", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.spec_item = self.canvas.create_image(0, 0, anchor="nw")
+        self.spec_text = self.canvas.create_text(SPEC_SIZE[0] // 2, SPEC_SIZE[1] // 2, text="",
+                                                 fill="white", font=("Arial", 20))
+        # 播放光标：每帧只移动这一条线，不重绘语谱图
+        self.playhead = self.canvas.create_line(0, 0, 0, 0, fill="white", width=2, state="hidden")
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag_move)
+        self.canvas.bind("<ButtonRelease-1>", self.on_drag_end)
+        self.canvas.bind("<ButtonPress-3>", self.on_segment_delete)
+        # 长录音：Ctrl+滚轮缩放，滚轮横向滚动（Linux 下滚轮为 Button-4/5）
+        self.canvas.bind("<Control-MouseWheel>", lambda e: self.on_wheel(e, zoom=True))
+        self.canvas.bind("<MouseWheel>", lambda e: self.on_wheel(e, zoom=False))
+        self.canvas.bind("<Control-Button-4>", lambda e: self.on_wheel(e, zoom=True))
+        self.canvas.bind("<Control-Button-5>", lambda e: self.on_wheel(e, zoom=True))
+        self.canvas.bind("<Button-4>", lambda e: self.on_wheel(e, zoom=False))
+        self.canvas.bind("<Button-5>", lambda e: self.on_wheel(e, zoom=False))
+        self.canvas.bind("<Configure>", lambda e: self.schedule_view())
+        self.hscroll = ttk.Scrollbar(self.frame_left, orient="horizontal", command=self.on_hscroll)
+        self.hscroll.pack(fill="x")
 
         # 控制区（播放按钮 + 上一首/下一首）
         frame_controls = tk.Frame(self.frame_left, bg="black")
@@ -55,10 +196,31 @@ class AudioLabelTool:
         self.btn_play.grid(row=0, column=1, padx=15)
         self.btn_next = ttk.Button(frame_controls, text="下一首 ⏭", style="Next.TButton", command=self.next_audio)
         self.btn_next.grid(row=0, column=2, padx=15)
+        self.btn_skip = ttk.Button(frame_controls, text="未标注 ⏩", style="Next.TButton", command=self.next_unlabelled_audio)
+        self.btn_skip.grid(row=0, column=3, padx=15)
+        self.btn_gallery = ttk.Button(frame_controls, text="▦ 网格", style="Next.TButton", command=self.open_gallery)
+        self.btn_gallery.grid(row=0, column=4, padx=15)
 
-        # 播放进度条
+        # 播放进度条：点击或拖动即跳转，播放中也可拖动试听
         self.progress = ttk.Scale(self.frame_left, from_=0, to=100, orient="horizontal", length=700)
         self.progress.pack(pady=10)
+        self.scrubbing = False
+        self.progress.bind("<ButtonPress-1>", self.on_scrub)
+        self.progress.bind("<B1-Motion>", self.on_scrub)
+        self.progress.bind("<ButtonRelease-1>", self.on_scrub_end)
+
+        # 播放速度：保持音高时用 WSOLA 时间伸缩，否则变速变调（放慢可把高频内容降到可听范围）
+        frame_rate = tk.Frame(self.frame_left, bg="black")
+        frame_rate.pack(pady=5)
+        tk.Label(frame_rate, text="速度", font=("Arial", 12), fg="white", bg="black").pack(side="left")
+        self.rate_var = tk.StringVar(value="1.0")
+        rate_box = ttk.Combobox(frame_rate, textvariable=self.rate_var, values=[str(r) for r in RATE_STEPS],
+                                width=5, state="readonly")
+        rate_box.pack(side="left", padx=5)
+        rate_box.bind("<<ComboboxSelected>>", lambda e: self.apply_rate())
+        self.preserve_pitch = tk.BooleanVar(value=True)
+        tk.Checkbutton(frame_rate, text="保持音高", variable=self.preserve_pitch, command=self.apply_rate,
+                       font=("Arial", 12), fg="white", bg="black", selectcolor="black").pack(side="left", padx=5)
 
         # 打开文件夹
         self.btn_open = ttk.Button(self.frame_right, text="📂 打开文件夹", style="Play.TButton", command=self.open_folder)
@@ -66,136 +228,860 @@ class AudioLabelTool:
 
         # 标注按钮
         tk.Label(self.frame_right, text="标注结果：", font=("Arial", 18), bg="#f8f9fa").pack(pady=40)
-        self.btn_yes = ttk.Button(self.frame_right, text="1", style="Yes.TButton", command=lambda: self.save_label(1))
-        self.btn_yes.pack(pady=10)
-        self.btn_no = ttk.Button(self.frame_right, text="0", style="No.TButton", command=lambda: self.save_label(0))
-        self.btn_no.pack(pady=10)
+        self.label_buttons = []
+        for value in self.classes:
+            style_name = {"1": "Yes.TButton", "0": "No.TButton"}.get(value, "Class.TButton")
+            btn = ttk.Button(self.frame_right, text=value, style=style_name,
+                             command=lambda v=value: self.save_label(v))
+            btn.pack(pady=10)
+            self.label_buttons.append(btn)
+        self.unsure = tk.BooleanVar(value=False)
+        self.unsure_check = tk.Checkbutton(self.frame_right, text="不确定", variable=self.unsure,
+                                           font=("Arial", 12), bg="#f8f9fa")
+        self.auto_advance = tk.BooleanVar(value=True)
+        self.auto_advance_check = tk.Checkbutton(self.frame_right, text="标注后自动下一首",
+                                                 variable=self.auto_advance, font=("Arial", 12), bg="#f8f9fa")
+        self.auto_advance_check.pack(pady=20)
+        self.update_unsure_toggle()
+        tk.Label(self.frame_right, text="区间类别：", font=("Arial", 12), bg="#f8f9fa").pack()
+        self.segment_label = tk.StringVar(value=self.classes[0])
+        ttk.Combobox(self.frame_right, textvariable=self.segment_label, values=self.classes,
+                     width=10).pack(pady=5)
+
+        # 导航顺序：按声学特征排序 / 筛选（特征索引见 features.py）
+        frame_order = tk.LabelFrame(self.frame_right, text="队列", font=("Arial", 12), bg="#f8f9fa")
+        frame_order.pack(pady=10, padx=10, fill="x")
+        self.feature_by_label = {feature_label(name): name for name in FEATURES}
+        self.sort_var = tk.StringVar(value="文件名")
+        ttk.Combobox(frame_order, textvariable=self.sort_var, values=["文件名"] + list(self.feature_by_label),
+                     state="readonly", width=22).grid(row=0, column=0, columnspan=2, pady=3)
+        self.sort_desc = tk.BooleanVar(value=True)
+        tk.Checkbutton(frame_order, text="降序", variable=self.sort_desc, bg="#f8f9fa").grid(row=1, column=0)
+        tk.Label(frame_order, text="最小值", bg="#f8f9fa").grid(row=2, column=0)
+        self.filter_var = tk.StringVar()
+        tk.Entry(frame_order, textvariable=self.filter_var, width=8).grid(row=2, column=1)
+        tk.Button(frame_order, text="应用", command=self.apply_order).grid(row=1, column=1)
+        tk.Button(frame_order, text="计算特征", command=self.compute_features).grid(row=3, column=0, columnspan=2, pady=3)
+        # 主动学习：后台进程用已有标注训练小模型，把最不确定的未标注音频排到前面
+        self.active_mode = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame_order, text="按模型不确定性排序", variable=self.active_mode, command=self.retrain,
+                       bg="#f8f9fa").grid(row=4, column=0, columnspan=2)
+
+        # 空白音频预筛（python triage.py 生成 triage.csv）：批量确认建议，或导航时跳过
+        frame_triage = tk.LabelFrame(self.frame_right, text="预筛", font=("Arial", 12), bg="#f8f9fa")
+        frame_triage.pack(pady=5, padx=10, fill="x")
+        self.auto_skip = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame_triage, text="跳过预筛为空白的音频", variable=self.auto_skip,
+                       bg="#f8f9fa").pack()
+        self.btn_confirm = tk.Button(frame_triage, text="确认全部建议", command=self.confirm_proposals)
+        self.btn_confirm.pack(pady=3)
 
-        # 定时检测播放状态
-        self.root.after(500, self.check_music_end)
-        self.root.after(500, self.update_progress)
+        # 近重复音频（python fingerprint.py 批量计算指纹）：显示当前音频所在组，可把标签传播到整组
+        frame_dup = tk.LabelFrame(self.frame_right, text="近重复", font=("Arial", 12), bg="#f8f9fa")
+        frame_dup.pack(pady=5, padx=10, fill="x")
+        self.dup_var = tk.StringVar(value="无近重复")
+        tk.Label(frame_dup, textvariable=self.dup_var, bg="#f8f9fa").grid(row=0, column=0, columnspan=2)
+        tk.Button(frame_dup, text="计算指纹", command=self.compute_fingerprints).grid(row=1, column=0, pady=3)
+        tk.Button(frame_dup, text="标签传播到整组", command=self.propagate_label).grid(row=1, column=1, pady=3)
+
+        # 状态栏（非模态，不打断标注）
+        self.status_var = tk.StringVar()
+        tk.Label(self.frame_right, textvariable=self.status_var, font=("Arial", 11), bg="#f8f9fa",
+                 fg="#6c757d", wraplength=360, justify="left").pack(side="bottom", pady=20)
+
+        # 快捷键
+        self.pending_load = None
+        self.last_nav_time = 0.0
+        self.keymap, warning = load_keymap()
+        if warning is not None:
+            self.status_var.set(warning)
+        for value in self.classes:
+            self.keymap.setdefault(f"label_{value}", [value] if len(value) == 1 else [])
+        self.bind_hotkeys()
+        disable_focus(self.root)
+        # 下拉框选完后把焦点还给语谱图，快捷键立即可用
+        self.root.bind_class("TCombobox", "<<ComboboxSelected>>", lambda e: self.canvas.focus_set(), add="+")
+        names = [(f"label_{value}", f"标注 {value}") for value in self.classes]
+        names += [("play_pause", "播放/暂停"), ("prev", "上一首"), ("next", "下一首"),
+                  ("next_unlabelled", "下一条未标注"), ("speed_down", "减速"), ("speed_up", "加速")]
+        hints = [f"{name}: {'/'.join(self.keymap[action])}" for action, name in names if self.keymap.get(action)]
+        tk.Label(self.frame_right, text="\n".join(hints), font=("Arial", 10), bg="#f8f9fa",
+                 fg="#6c757d", justify="left").pack(side="bottom")
+
+        # 关闭窗口时把标注日志合并回 CSV
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # ===== 功能实现 =====
 
     def open_folder(self):
-        folder = filedialog.askdirectory(title="选择包含 audio/ 与 spectrogram/ 的文件夹")
+        folder = filedialog.askdirectory(title="选择包含 audio/ 的文件夹")
         if not folder:
             return
         self.audio_folder = os.path.join(folder, "audio")
         self.spec_folder = os.path.join(folder, "spectrogram")
 
-        if not os.path.exists(self.audio_folder) or not os.path.exists(self.spec_folder):
-            messagebox.showerror("错误", "该文件夹下必须包含 audio/ 和 spectrogram/ 两个子文件夹！")
+        if not os.path.exists(self.audio_folder):
+            messagebox.showerror("错误", "该文件夹下必须包含 audio/ 子文件夹！")
             return
+        # 缺失的语谱图会在浏览时自动生成到 spectrogram/
+        os.makedirs(self.spec_folder, exist_ok=True)
 
-        self.audio_files = [f for f in os.listdir(self.audio_folder)
-                            if f.lower().endswith(('.wav', '.mp3'))]
-        self.audio_files.sort()
+        # 清单按目录修改时间增量刷新，未变化时不重新扫描
+        self.manifest = Manifest(folder, self.audio_folder, self.spec_folder)
+        self.manifest.refresh()
+        self.audio_files = self.manifest.audio_files
 
         if not self.audio_files:
             messagebox.showerror("错误", "未找到音频文件！")
             return
 
-        self.current_index = 0
+        if self.use_session:
+            self.open_session(folder)
+
+        # 时长索引：已缓存的直接复用，其余在后台解析文件头
+        if self.durations is not None:
+            self.durations.save()
+        self.durations = DurationIndex(folder, self.audio_folder)
+        threading.Thread(target=self.build_durations, args=(self.durations, list(self.audio_files), self.session),
+                         daemon=True).start()
+        self.features = FeatureIndex(folder, self.audio_folder)
+        self.proposals = load_proposals(folder)
+        self.btn_confirm.config(text=f"确认全部建议（{len(self.proposals)}）")
+        self.fingerprints = FingerprintIndex(folder, self.audio_folder)
+        self.duplicates = {}
+        if len(self.fingerprints):
+            self.find_duplicates(build=False)
+        self.sort_var.set("文件名")
+        if self.learner is not None:
+            self.learner.close()
+            self.learner = None
+
+        # 已有标注只读取一次，直接从第一个未标注的音频开始；会话库模式下回到上次浏览、仍未标注的音频
+        self.unlabelled = UnlabelledIndex(self.audio_files, self.label_store.labelled_files())
+        first = self.unlabelled.next_unlabelled(0)
+        self.current_index = first if first is not None else 0
+        if self.session is not None:
+            last = self.session.last_file()
+            if last in self.audio_files:
+                index = self.audio_files.index(last)
+                if not self.unlabelled.is_labelled(index):
+                    self.current_index = index
+        self.prefetcher.clear()
         self.load_current_audio()
+        if self.session is not None:
+            self.status_var.set(f"剩余未标注 {self.session.count_remaining()} 条")
 
-    def load_current_audio(self):
-        audio_path = os.path.join(self.audio_folder, self.audio_files[self.current_index])
-        spec_path = os.path.join(self.spec_folder,
-                                 os.path.splitext(self.audio_files[self.current_index])[0] + ".png")
+    def make_label_writer(self):
+        # 标注写盘在专用线程中完成，落盘后回到 Tk 线程更新状态栏
+        return LabelWriter(self.label_store,
+                           on_flushed=lambda items: self.ui.post(self.on_labels_flushed, items, done=len(items)))
 
-        # 加载语谱图
-        if os.path.exists(spec_path):
-            img = Image.open(spec_path)
-            img = img.resize((800, 500))
-            self.img_tk = ImageTk.PhotoImage(img)
-            self.label_img.config(image=self.img_tk)
+    def put_label(self, file_name, label, confidence):
+        """交给写线程落盘；写完的批次经 UiQueue 送回，期间保持轮询"""
+        self.ui.expect()
+        self.label_writer.put(file_name, label, confidence)
+
+    def update_unsure_toggle(self):
+        """"不确定" 只在 SQLite 存储（记录置信度）时显示；CSV 只有 file,label 两列"""
+        if isinstance(self.label_store, LabelStore):
+            self.unsure.set(False)
+            self.unsure_check.pack_forget()
         else:
-            self.label_img.config(image='', text='[无语谱图]', fg='white', bg='black', font=('Arial', 20))
+            self.unsure_check.pack(before=self.auto_advance_check)
 
-        pygame.mixer.music.load(audio_path)
+    def open_session(self, folder):
+        """切换到数据集目录下的会话库，并同步当前清单"""
+        self.label_writer.close()
+        self.label_store.close()
+        self.session = SessionDB(os.path.join(folder, SESSION_FILE), self.annotator, self.classes)
+        self.label_store = self.session
+        self.label_writer = self.make_label_writer()
+        self.update_unsure_toggle()
+        self.session.sync_manifest(self.audio_files, self.manifest.has_spectrogram)
+
+    def build_durations(self, durations, audio_files, session):
+        """后台线程：解析全部时长；会话库模式下同时写入 clips 表"""
+        durations.build(audio_files)
+        if session is not None:
+            session.store_durations(durations.as_dict())
+
+    def clip_paths(self, index):
+        """返回第 index 条音频的 (音频路径, 语谱图路径)"""
+        name = self.audio_files[index]
+        return (os.path.join(self.audio_folder, name),
+                os.path.join(self.spec_folder, os.path.splitext(name)[0] + ".png"))
+
+    def request_load(self):
+        """导航后加载当前音频；按住方向键连续翻页时只更新标题，停下后才解码加载"""
+        now = time.monotonic()
+        rapid = (now - self.last_nav_time) * 1000 < NAV_DEBOUNCE_MS
+        self.last_nav_time = now
+        if self.pending_load is not None:
+            self.root.after_cancel(self.pending_load)
+            self.pending_load = None
+        if self.gallery is not None:
+            # 网格正在使用播放器：只更新标题，关闭网格时再加载（见 on_gallery_closed）
+            self.select_current_audio()
+            return
+        if rapid:
+            self.select_current_audio()
+            self.pending_load = self.root.after(NAV_DEBOUNCE_MS, self.run_pending_load)
+        else:
+            self.load_current_audio()
+
+    def run_pending_load(self):
+        self.pending_load = None
+        self.load_current_audio()
+
+    def select_current_audio(self):
+        """切换当前音频的轻量部分：不读盘，旧音频的回调随之失效"""
+        audio_path = self.clip_paths(self.current_index)[0]
+        self.current_audio_path = audio_path
+        self.audio_ready = False
+        self.pyramid = None
+        self.spec_layout = None
+        self.canvas.delete("segment")
+        self.canvas.itemconfig(self.playhead, state="hidden")
+        self.canvas.delete("triage")
         self.root.title(f"音频标注工具 - {os.path.basename(audio_path)}")
         self.progress.set(0)
 
+    def load_current_audio(self):
+        self.select_current_audio()
+        audio_path, spec_path = self.clip_paths(self.current_index)
+        self.current_duration = self.durations.get(self.audio_files[self.current_index])
+        if self.session is not None:
+            self.session.log_event(self.audio_files[self.current_index], "view")
+
+        # 语谱图解码与音频预读在后台完成，就绪后回到 Tk 线程显示
+        self.prefetcher.get(audio_path, spec_path, self.show_clip)
+        self.prefetcher.prefetch(self.current_index, len(self.audio_files), self.clip_paths)
+
+    def show_clip(self, clip):
+        if clip.audio_path != self.current_audio_path:
+            return  # 已经切换到其他音频
+
+        # 加载语谱图
+        if clip.image is not None and not self.manifest.has_spectrogram(os.path.basename(clip.audio_path)):
+            self.manifest.add_spectrogram(os.path.basename(clip.audio_path))
+            if self.session is not None:
+                self.session.mark_spectrogram(os.path.basename(clip.audio_path))
+        self.spec_layout = clip.layout
+        if clip.photo is not None:
+            self.img_tk = clip.photo
+            self.canvas.itemconfig(self.spec_item, image=self.img_tk)
+            self.canvas.itemconfig(self.spec_text, text='')
+        else:
+            self.canvas.itemconfig(self.spec_item, image='')
+            self.canvas.itemconfig(self.spec_text, text='[无语谱图]')
+
+        # 音频无法打开时仍显示并允许标注，只是不能播放
+        try:
+            if clip.audio_data is not None:
+                self.playback.load(io.BytesIO(clip.audio_data))
+            else:
+                self.playback.load(clip.audio_path)
+        except (OSError, RuntimeError) as e:
+            self.player.close()
+            clip.error = clip.error or f"音频无法打开: {e}"
+        if clip.error is not None:
+            self.status_var.set(f"{os.path.basename(clip.audio_path)}: {clip.error}")
+        if not self.current_duration:  # 时长索引无法解析的格式以解码器为准
+            self.current_duration = self.player.duration
+        self.view_start, self.view_span, self.view_size = 0.0, self.current_duration, SPEC_SIZE
+        self.hscroll.set(0, 1)
+        self.audio_ready = True
+        self.draw_segments()
+        self.show_proposal()
+        self.show_duplicates()
+        if self.current_duration >= PYRAMID_MIN_SECONDS:
+            self.open_pyramid(clip.audio_path)
+
+    # ===== 长录音的瓦片视图 =====
+
+    def open_pyramid(self, audio_path):
+        """长录音先显示概览图，瓦片金字塔就绪后切换为可缩放视图（缺失时在后台生成）"""
+        out_dir = tiles_dir(self.spec_folder, os.path.basename(audio_path))
+        if pyramid_up_to_date(audio_path, out_dir):
+            self.show_pyramid(out_dir)
+            return
+        self.status_var.set("正在生成长录音的分层语谱图…")
+        future = self.spec_engine.submit_pyramid(audio_path, out_dir)
+        self.ui.when_done(future, self.on_pyramid_built, audio_path, out_dir)
+
+    def on_pyramid_built(self, audio_path, out_dir, future):
+        if audio_path != self.current_audio_path or future.cancelled():
+            return
+        if future.exception() is not None:
+            self.status_var.set(f"分层语谱图生成失败: {future.exception()}")
+            return
+        self.status_var.set("")
+        self.show_pyramid(out_dir)
+
+    def show_pyramid(self, out_dir):
+        self.pyramid = Pyramid(out_dir)
+        self.render_view()
+
+    def schedule_view(self):
+        """窗口尺寸变化时合并连续的重绘请求"""
+        if self.pyramid is None or self.pending_view is not None:
+            return
+        self.pending_view = self.root.after(50, self.render_view)
+
+    def render_view(self):
+        """按当前时间窗与画布尺寸渲染可见部分，只读取落在窗口内的瓦片"""
+        self.pending_view = None
+        if self.pyramid is None:
+            return
+        width, height = max(self.canvas.winfo_width(), 1), max(self.canvas.winfo_height(), 1)
+        self.view_size = (width, height)
+        self.view_span = min(max(self.view_span, MIN_VIEW_SECONDS), self.current_duration)
+        self.view_start = min(max(self.view_start, 0.0), self.current_duration - self.view_span)
+        self.img_tk = ImageTk.PhotoImage(self.pyramid.render(self.view_start, self.view_span, width, height))
+        self.canvas.itemconfig(self.spec_item, image=self.img_tk)
+        self.canvas.itemconfig(self.spec_text, text='')
+        self.hscroll.set(self.view_start / self.current_duration,
+                         (self.view_start + self.view_span) / self.current_duration)
+        self.draw_segments()
+        if self.playback.state != PlaybackController.IDLE:
+            self.move_playhead(self.player.position, follow=False)
+
+    def on_wheel(self, event, zoom):
+        if self.pyramid is None:
+            return
+        up = event.num == 4 or event.delta > 0
+        if zoom:
+            # 以光标所在时刻为中心缩放
+            t = self.time_at(event.x)
+            self.view_span *= 1 / ZOOM_STEP if up else ZOOM_STEP
+            self.view_span = min(max(self.view_span, MIN_VIEW_SECONDS), self.current_duration)
+            self.view_start = t - event.x / self.view_size[0] * self.view_span
+        else:
+            self.view_start += (-0.1 if up else 0.1) * self.view_span
+        self.render_view()
+
+    def on_hscroll(self, action, value, unit=None):
+        if self.pyramid is None:
+            return
+        if action == "moveto":
+            self.view_start = float(value) * self.current_duration
+        else:
+            self.view_start += int(value) * self.view_span * (0.1 if unit == "units" else 0.9)
+        self.render_view()
+
+    # ===== 区间标注 =====
+
+    def time_at(self, x):
+        """画布横坐标 -> 秒（基于当前可见时间窗）"""
+        return self.view_start + min(max(x / self.view_size[0], 0.0), 1.0) * self.view_span
+
+    def freq_layout(self):
+        """当前显示的语谱图的帧长与最底行频点：金字塔瓦片与单张语谱图的行布局不同。
+
+        不是本工具生成的语谱图（数据集自带的 PNG）返回 None：纵坐标与频率的对应关系未知，只能标注时间区间。
+        """
+        if self.pyramid is not None:
+            return {"n_fft": self.pyramid.n_fft, "first_bin": FIRST_BIN}
+        return self.spec_layout
+
+    def freq_at(self, y):
+        """画布纵坐标 -> Hz，按语谱图的帧长与行布局换算；仅在 freq_layout() 不为 None 时调用"""
+        return row_to_hz(min(max(y / self.view_size[1], 0.0), 1.0), self.player.samplerate, **self.freq_layout())
+
+    def x_at(self, seconds):
+        return (seconds - self.view_start) / self.view_span * self.view_size[0] if self.view_span > 0 else 0
+
+    def y_at(self, hz):
+        if not self.player.samplerate:
+            return 0
+        return hz_to_row(hz, self.player.samplerate, **self.freq_layout()) * self.view_size[1]
+
+    def on_drag_start(self, event):
+        self.canvas.focus_set()
+        if not self.audio_ready or not self.current_duration:
+            return
+        band = bool(event.state & 0x0001)  # Shift
+        if band and self.freq_layout() is None:
+            band = False
+            self.status_var.set("该语谱图不是本工具生成的，频率坐标未知，只能标注时间区间")
+        y = event.y if band else 0
+        self.drag = (event.x, y, band)
+        self.canvas.create_rectangle(event.x, y, event.x, self.view_size[1], outline="#ffc107",
+                                     width=2, dash=(4, 2), tags="drag")
+
+    def on_drag_move(self, event):
+        if self.drag is None:
+            return
+        x0, y0, band = self.drag
+        self.canvas.coords("drag", x0, y0, event.x, event.y if band else self.view_size[1])
+
+    def on_drag_end(self, event):
+        if self.drag is None:
+            return
+        x0, y0, band = self.drag
+        self.drag = None
+        self.canvas.delete("drag")
+        if not self.audio_ready:
+            return
+        if abs(event.x - x0) < MIN_DRAG_PX:
+            self.playback.seek(self.time_at(event.x))  # 单击语谱图：跳转到该时刻
+            return
+        start, end = sorted((self.time_at(x0), self.time_at(event.x)))
+        fmin = fmax = None
+        if band and abs(event.y - y0) >= MIN_DRAG_PX:
+            fmin, fmax = sorted((self.freq_at(y0), self.freq_at(event.y)))
+        file_name = self.audio_files[self.current_index]
+        self.segments.add(file_name, Segment(start, end, fmin, fmax, self.segment_label.get()))
+        self.draw_segments()
+        self.status_var.set(f"已添加区间: {file_name} {start:.2f}–{end:.2f}s")
+
+    def on_segment_delete(self, event):
+        """右键删除光标处的区间（多个重叠时删除最短的一个）"""
+        if not self.audio_ready:
+            return
+        file_name = self.audio_files[self.current_index]
+        t = self.time_at(event.x)
+        hits = self.segments.index(file_name).query(t, t)
+        if self.freq_layout() is not None:
+            hz = self.freq_at(event.y)
+            hits = [s for s in hits if s.fmin is None or s.fmin <= hz <= s.fmax]
+        if not hits:
+            return
+        self.segments.remove(file_name, min(hits, key=lambda s: s.end - s.start))
+        self.draw_segments()
+
+    def draw_segments(self):
+        """重画当前音频的区间；只取与可见时间范围重叠的区间"""
+        self.canvas.delete("segment")
+        if not self.audio_ready or not self.current_duration:
+            return
+        file_name = self.audio_files[self.current_index]
+        has_freq = self.freq_layout() is not None  # 频率坐标未知时频带按整列显示
+        for s in self.segments.index(file_name).query(self.view_start, self.view_start + self.view_span):
+            x0, x1 = self.x_at(s.start), self.x_at(s.end)
+            y0 = self.y_at(s.fmax) if has_freq and s.fmax is not None else 0
+            y1 = self.y_at(s.fmin) if has_freq and s.fmin is not None else self.view_size[1]
+            self.canvas.create_rectangle(x0, y0, x1, y1, outline="#ffc107", width=2, tags="segment")
+            self.canvas.create_text(x0 + 3, y0 + 3, text=s.label, anchor="nw", fill="#ffc107",
+                                    font=("Arial", 10, "bold"), tags="segment")
+        self.canvas.tag_raise(self.playhead)
+
     def play_pause(self):
-        if not self.audio_files:
+        if not self.audio_files or not self.audio_ready or not self.player.frames:
             return
-        if not self.is_playing:
-            pygame.mixer.music.play()
-            self.is_playing = True
+        self.playback.toggle()
+        if self.session is not None and self.playback.state == PlaybackController.PLAYING:
+            self.session.log_event(self.audio_files[self.current_index], "play")
+
+    def on_playback_state(self, state):
+        if state == PlaybackController.PLAYING:
             self.btn_play.config(text="⏸ 暂停")
         else:
-            pygame.mixer.music.pause()
-            self.is_playing = False
             self.btn_play.config(text="▶ 播放")
 
+    def on_playback_position(self, seconds):
+        """更新播放进度条与语谱图上的播放光标"""
+        if self.current_duration > 0 and not self.scrubbing:
+            self.progress.set(min(seconds / self.current_duration, 1) * 100)
+        self.move_playhead(seconds)
+
+    def move_playhead(self, seconds, follow=True):
+        if not self.audio_ready or self.view_span <= 0:
+            self.canvas.itemconfig(self.playhead, state="hidden")
+            return
+        visible = self.view_start <= seconds <= self.view_start + self.view_span
+        if not visible and not follow:
+            self.canvas.itemconfig(self.playhead, state="hidden")
+            return
+        if not visible and self.pyramid is not None:
+            # 长录音播放到可见窗口之外时整页跟随
+            self.view_start = seconds
+            self.render_view()
+        x = self.x_at(seconds)
+        self.canvas.coords(self.playhead, x, 0, x, self.view_size[1])
+        self.canvas.itemconfig(self.playhead, state="normal")
+
+    def apply_rate(self):
+        """速度在播放引擎中按块实时处理，不预先渲染整个文件；切换音频后保持不变"""
+        self.playback.set_rate(float(self.rate_var.get()), self.preserve_pitch.get())
+
+    def step_rate(self, step):
+        rate = float(self.rate_var.get())
+        index = min(range(len(RATE_STEPS)), key=lambda i: abs(RATE_STEPS[i] - rate))
+        self.rate_var.set(str(RATE_STEPS[min(max(index + step, 0), len(RATE_STEPS) - 1)]))
+        self.apply_rate()
+
+    def on_scrub(self, event):
+        """点击或拖动进度条：跳转播放位置（只移动读取游标，不复制音频数据）"""
+        if not self.audio_ready or not self.current_duration:
+            return "break"
+        self.scrubbing = True
+        fraction = min(max(event.x / max(self.progress.winfo_width(), 1), 0.0), 1.0)
+        self.progress.set(fraction * 100)
+        self.playback.seek(fraction * self.current_duration)
+        return "break"  # 不执行 ttk.Scale 默认的按步长移动
+
+    def on_scrub_end(self, event):
+        self.scrubbing = False
+        return "break"
+
+    # ===== 队列排序与筛选 =====
+
+    def apply_order(self):
+        """按所选特征排序 / 筛选导航列表；筛选保留不小于最小值的音频，尚未计算特征的排在最后"""
+        if self.manifest is None:
+            return
+        files = list(self.manifest.audio_files)
+        feature = self.feature_by_label.get(self.sort_var.get())
+        if feature is not None:
+            values = self.features.column(feature)
+            threshold = self.filter_var.get().strip()
+            if threshold:
+                try:
+                    minimum = float(threshold)
+                except ValueError:
+                    self.status_var.set(f"最小值不是数字: {threshold}")
+                    return
+                files = [name for name in files if values.get(name, float("-inf")) >= minimum]
+            missing = [name for name in files if name not in values]
+            files = sorted((name for name in files if name in values), key=values.get,
+                           reverse=self.sort_desc.get()) + missing
+            if missing:
+                self.status_var.set(f"{len(missing)} 条音频尚未计算特征，已排在最后")
+        if not files:
+            self.status_var.set("没有符合条件的音频")
+            return
+        self.set_order(files)
+
+    def set_order(self, files):
+        """替换导航顺序，保留已标注状态；当前音频仍在列表中时不重新加载"""
+        labelled = {name for i, name in enumerate(self.audio_files) if self.unlabelled.is_labelled(i)}
+        current = self.audio_files[self.current_index]
+        self.audio_files = files
+        self.unlabelled = UnlabelledIndex(files, labelled | self.label_store.labelled_files())
+        if current in files:
+            self.current_index = files.index(current)
+            self.prefetcher.prefetch(self.current_index, len(files), self.clip_paths)
+        else:
+            first = self.unlabelled.next_unlabelled(0)
+            self.go_to(first if first is not None else 0)
+
+    def compute_features(self):
+        """在后台线程中补算缺失的特征（大数据集建议先用 python features.py 多进程批量计算）"""
+        if self.features is None:
+            return
+        self.status_var.set("正在计算特征…")
+        features = self.features
+        files = list(self.manifest.audio_files)
+        self.ui.run_thread(lambda: features.build(files), self.on_features_built, features)
+
+    def on_features_built(self, features, future):
+        if features is not self.features:
+            return  # 期间已切换数据集
+        if future.exception() is not None:
+            self.status_var.set(f"特征计算失败: {future.exception()}")
+            return
+        self.status_var.set(f"特征计算完成，共 {len(features)} 条")
+
+    def retrain(self):
+        """提交一次后台训练；完成后按不确定性重排队列"""
+        if not self.active_mode.get() or self.features is None:
+            return
+        if not os.path.exists(self.features.path):
+            self.status_var.set("请先计算特征")
+            return
+        if self.learner is None:
+            self.learner = ActiveLearner(self.features.path, self.classes)
+        labels = {name: self.label_store.get(name) for name in self.label_store.labelled_files()}
+        future = self.learner.submit(labels)
+        if future is None:
+            return  # 上一次训练尚未结束
+        self.status_var.set(f"正在用 {len(labels)} 条标注训练排序模型…")
+        self.ui.when_done(future, self.on_ranked)
+
+    def on_ranked(self, future):
+        if future.cancelled() or not self.active_mode.get():
+            return
+        if future.exception() is not None:
+            self.status_var.set(f"排序模型训练失败: {future.exception()}")
+            return
+        result = future.result()
+        if result is None:
+            self.status_var.set("至少需要两个类别的标注才能训练排序模型")
+            return
+        ranked, n_train, accuracy = result
+        # features.npz 可能包含已删除或已移出文件夹的音频，只保留当前清单中的文件
+        available = set(self.manifest.audio_files)
+        ranked = [name for name in ranked if name in available]
+        # 当前音频留在最前，其后依次为最不确定的未标注音频，已标注与缺少特征的排在最后
+        current = self.audio_files[self.current_index]
+        files = [current] + [name for name in ranked if name != current]
+        seen = set(files)
+        files += [name for name in self.manifest.audio_files if name not in seen]
+        self.set_order(files)
+        self.status_var.set(f"已按不确定性重排 {len(ranked)} 条（训练 {n_train} 条，训练集准确率 {accuracy:.0%}）")
+
+    def go_to(self, index):
+        self.current_index = index
+        self.playback.stop()
+        self.request_load()
+
     def next_audio(self):
         if not self.audio_files:
             return
-        self.current_index = (self.current_index + 1) % len(self.audio_files)
-        pygame.mixer.music.stop()
-        self.is_playing = False
-        self.btn_play.config(text="▶ 播放")
-        self.load_current_audio()
+        self.go_to(self.step_index(1))
 
     def prev_audio(self):
         if not self.audio_files:
             return
-        self.current_index = (self.current_index - 1) % len(self.audio_files)
-        pygame.mixer.music.stop()
-        self.is_playing = False
-        self.btn_play.config(text="▶ 播放")
+        self.go_to(self.step_index(-1))
+
+    def next_unlabelled_audio(self):
+        """跳到当前位置之后第一个未标注的音频，不加载中间已标注的音频"""
+        if not self.audio_files:
+            return
+        index = self.unlabelled.next_unlabelled(self.current_index + 1)
+        for _ in range(len(self.audio_files)):
+            if index is None or not self.is_skipped(index):
+                break
+            index = self.unlabelled.next_unlabelled(index + 1)
+        if index is None or self.is_skipped(index):
+            self.status_var.set("所有音频均已标注" if index is None else "剩余未标注音频均已预筛为空白")
+            return
+        self.go_to(index)
+
+    # ===== 预筛建议 =====
+
+    def is_skipped(self, index):
+        """开启跳过时，预筛为空白且尚未标注的音频不在导航中出现"""
+        return (self.auto_skip.get() and self.audio_files[index] in self.proposals
+                and not self.unlabelled.is_labelled(index))
+
+    def step_index(self, step):
+        count = len(self.audio_files)
+        index = self.current_index
+        for _ in range(count):
+            index = (index + step) % count
+            if not self.is_skipped(index):
+                return index
+        return (self.current_index + step) % count
+
+    def show_proposal(self):
+        """当前音频有预筛建议且未标注时，在语谱图左上角以醒目颜色标出"""
+        self.canvas.delete("triage")
+        proposal = self.proposals.get(self.audio_files[self.current_index])
+        if proposal is None or self.unlabelled.is_labelled(self.current_index):
+            return
+        label_value, reason = proposal
+        self.canvas.create_text(8, 8, anchor="nw", text=f"预筛建议：{label_value}（{TRIAGE_REASONS.get(reason, reason)}）",
+                                fill="#fd7e14", font=("Arial", 14, "bold"), tags="triage")
+
+    def confirm_proposals(self):
+        """把所有尚未标注的预筛建议一次性写入标注"""
+        if not self.proposals:
+            self.status_var.set("没有预筛建议（先运行 python triage.py <数据集目录>）")
+            return
+        labelled = self.label_store.labelled_files()
+        positions = {name: i for i, name in enumerate(self.audio_files)}
+        todo = [name for name, (label_value, _) in self.proposals.items()
+                if label_value in self.classes and name not in labelled
+                and not (name in positions and self.unlabelled.is_labelled(positions[name]))]
+        if not todo:
+            self.status_var.set("预筛建议均已处理")
+            return
+        if not messagebox.askyesno("确认预筛建议", f"将 {len(todo)} 条预筛为空白的音频按建议标注？"):
+            return
+        for name in todo:
+            self.put_label(name, self.proposals[name][0], 1.0)
+            if name in positions:
+                self.unlabelled.mark_labelled(positions[name])
+        if self.session is not None:
+            self.session.log_events(todo, "triage")
+        self.show_proposal()
+        self.status_var.set(f"已按预筛建议标注 {len(todo)} 条")
+
+    # ===== 近重复组 =====
+
+    def compute_fingerprints(self):
+        """在后台线程中补算缺失的指纹并重新分组（大数据集建议先用 python fingerprint.py 多进程批量计算）"""
+        if self.fingerprints is None:
+            return
+        self.status_var.set("正在计算指纹…")
+        self.find_duplicates(build=True)
+
+    def find_duplicates(self, build):
+        """后台线程：（可选补算指纹后）用多索引哈希分组，完成后回到 Tk 线程"""
+        fingerprints = self.fingerprints
+        files = list(self.manifest.audio_files)
+
+        def run():
+            if build:
+                fingerprints.build(files)
+            return fingerprints.groups(files)
+
+        self.ui.run_thread(run, self.on_duplicates, fingerprints)
+
+    def on_duplicates(self, fingerprints, future):
+        if fingerprints is not self.fingerprints:
+            return  # 期间已切换数据集
+        if future.exception() is not None:
+            self.status_var.set(f"近重复分组失败: {future.exception()}")
+            return
+        groups = future.result()
+        self.duplicates = {name: members for members in groups for name in members}
+        self.show_duplicates()
+        self.status_var.set(f"近重复组 {len(groups)} 个，涉及 {len(self.duplicates)} 条音频")
+
+    def show_duplicates(self):
+        members = self.duplicates.get(self.audio_files[self.current_index]) if self.audio_files else None
+        if members is None:
+            self.dup_var.set("无近重复")
+            return
+        labelled = sum(1 for name in members if name in self.label_store)
+        self.dup_var.set(f"所在组 {len(members)} 条，已标注 {labelled} 条")
+
+    def propagate_label(self):
+        """把当前音频的标签写给同组尚未标注的音频"""
+        if not self.audio_files:
+            return
+        current = self.audio_files[self.current_index]
+        members = self.duplicates.get(current)
+        if members is None:
+            self.status_var.set("当前音频没有近重复")
+            return
+        label_value = self.label_store.get(current)
+        if label_value is None and self.last_saved is not None and self.last_saved[0] == current:
+            label_value = self.last_saved[1]
+        if label_value is None:
+            self.status_var.set("请先标注当前音频")
+            return
+        positions = {name: i for i, name in enumerate(self.audio_files)}
+        todo = [name for name in members if name != current and name not in self.label_store
+                and not (name in positions and self.unlabelled.is_labelled(positions[name]))]
+        if not todo:
+            self.status_var.set("同组音频均已标注")
+            return
+        for name in todo:
+            self.put_label(name, label_value, 1.0)
+            if name in positions:
+                self.unlabelled.mark_labelled(positions[name])
+        if self.session is not None:
+            self.session.log_events(todo, "duplicate")
+        self.status_var.set(f"已把标签 {label_value} 传播到同组 {len(todo)} 条音频")
+
+    # ===== 网格浏览 =====
+
+    def open_gallery(self):
+        """按当前导航顺序打开缩略图网格（见 gallery.py），已打开时切到前台"""
+        if not self.audio_files:
+            return
+        if self.gallery is not None:
+            self.gallery.root.lift()
+            return
+        # 网格与主窗口共用同一个播放控制器：取消尚未执行的防抖加载，并让仍在途中的
+        # show_clip 回调失效，否则它们会在网格播放中途把别的音频载入播放器
+        if self.pending_load is not None:
+            self.root.after_cancel(self.pending_load)
+            self.pending_load = None
+        self.current_audio_path = ""
+        self.audio_ready = False
+        self.playback.stop()
+        self.gallery = Gallery(self)
+
+    def on_gallery_closed(self):
+        """网格中可能播放过其他音频、标注过当前音频，重新加载当前音频"""
+        self.gallery = None
+        if self.closed:
+            return
+        self.playback.stop()
         self.load_current_audio()
 
-    def check_music_end(self):
-        """检测播放结束后恢复按钮"""
-        if not pygame.mixer.music.get_busy() and self.is_playing:
-            self.is_playing = False
-            self.btn_play.config(text="▶ 播放")
-        self.root.after(500, self.check_music_end)
-
-    def update_progress(self):
-        """更新播放进度条"""
-        if self.is_playing:
-            try:
-                pos = pygame.mixer.music.get_pos() / 1000  # 毫秒转秒
-                length = self.get_audio_length()
-                if length > 0:
-                    self.progress.set(pos / length * 100)
-            except:
-                pass
-        self.root.after(500, self.update_progress)
-
-    def get_audio_length(self):
-        """获取音频时长（秒）"""
-        try:
-            import wave
-            import contextlib
-            audio_path = os.path.join(self.audio_folder, self.audio_files[self.current_index])
-            if audio_path.endswith(".wav"):
-                with contextlib.closing(wave.open(audio_path, 'r')) as f:
-                    frames = f.getnframes()
-                    rate = f.getframerate()
-                    return frames / float(rate)
-        except:
-            return 0
-        return 0
+    def bind_hotkeys(self):
+        actions = {f"label_{value}": (lambda v=value: self.save_label(v)) for value in self.classes}
+        actions.update({
+            "play_pause": self.play_pause,
+            "prev": self.prev_audio,
+            "next": self.next_audio,
+            "next_unlabelled": self.next_unlabelled_audio,
+            "speed_down": lambda: self.step_rate(-1),
+            "speed_up": lambda: self.step_rate(1),
+        })
+        invalid = []
+        for action, keys in self.keymap.items():
+            command = actions.get(action)
+            if command is None:
+                continue
+            for key in keys:
+                try:
+                    self.root.bind(f"<KeyPress-{key}>", lambda e, c=command: self.on_hotkey(e, c))
+                except tk.TclError:
+                    invalid.append(key)
+        if invalid:
+            self.status_var.set(f"忽略无效的快捷键: {', '.join(invalid)}")
+
+    def on_hotkey(self, event, command):
+        if is_text_input(event.widget):
+            return None
+        command()
+        return "break"
 
     def save_label(self, label_value):
-        if not self.audio_files:
+        # 语谱图尚未显示（例如按住快捷键连续翻页）时不接受标注
+        if not self.audio_files or not self.audio_ready:
             return
         file_name = self.audio_files[self.current_index]
-        data = {"file": [file_name], "label": [label_value]}
+        confidence = 0.5 if self.unsure.get() else 1.0
+        self.unsure.set(False)
+        self.put_label(file_name, label_value, confidence)
+        self.last_saved = (file_name, label_value)
+        self.unlabelled.mark_labelled(self.current_index)
+        self.canvas.delete("triage")
+        self.status_var.set(f"保存中: {file_name} → {label_value}")
+        if self.auto_advance.get():
+            # 主动学习模式下队列可能包含训练期间刚标注的音频，直接跳到下一条未标注
+            if self.active_mode.get():
+                self.next_unlabelled_audio()
+            else:
+                self.next_audio()
 
-        if os.path.exists(self.output_file):
-            df = pd.read_csv(self.output_file)
-            df = df[df["file"] != file_name]
-            df = pd.concat([df, pd.DataFrame(data)], ignore_index=True)
-        else:
-            df = pd.DataFrame(data)
-        df.to_csv(self.output_file, index=False)
-        messagebox.showinfo("已保存", f"{file_name} 标注为 {label_value}")
+    def on_labels_flushed(self, items):
+        file_name, label_value, _ = items[-1]
+        extra = f"（本批 {len(items)} 条）" if len(items) > 1 else ""
+        self.status_var.set(f"已保存: {file_name} → {label_value}{extra}")
+        if self.active_mode.get() and self.learner is not None and self.learner.due(len(self.label_store)):
+            self.retrain()
+
+    def on_close(self):
+        self.closed = True
+        self.ui.close()
+        if self.gallery is not None:
+            self.gallery.close()
+        if self.learner is not None:
+            self.learner.close()
+        self.playback.close()
+        self.prefetcher.close()
+        self.spec_engine.close()
+        self.label_writer.close()
+        self.label_store.close()
+        self.segments.close()
+        if self.durations is not None:
+            self.durations.save()
+        self.root.destroy()
+
+# 主动学习在子进程中训练：子进程会重新导入本模块，界面只能在主进程中创建
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # PyInstaller 打包后子进程启动所需
+    parser = argparse.ArgumentParser(description="音频标注工具")
+    parser.add_argument("--output", default="labels.csv",
+                        help="标注输出：.csv 为单人 CSV，.db/.sqlite 为多人 SQLite 标注库")
+    parser.add_argument("--annotator", help="标注员 ID（默认当前系统用户名）")
+    parser.add_argument("--classes", default=",".join(DEFAULT_CLASSES), help="逗号分隔的类别，默认 1,0")
+    parser.add_argument("--session", action="store_true",
+                        help="使用数据集目录下的 SQLite 会话库保存标注、清单、时长与浏览历史")
+    args = parser.parse_args()
 
-root = tk.Tk()
-app = AudioLabelTool(root)
-root.mainloop()
\ No newline at end of file
+    root = tk.Tk()
+    app = AudioLabelTool(root, output_file=args.output, annotator=args.annotator,
+                         classes=[c.strip() for c in args.classes.split(",") if c.strip()],
+                         use_session=args.session)
+    root.mainloop()
\ No newline at end of file
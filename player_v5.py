@@ -1,13 +1,12 @@
 import os
 import csv
-import threading
-import time
 import tkinter as tk
 from tkinter import filedialog
 from tkinter import ttk
 from PIL import Image, ImageTk
-import sounddevice as sd
-import soundfile as sf
+from image_cache import ImageCache
+from manifest import Manifest
+from playback import PlaybackController, StreamPlayer
 
 # ================= 路径初始化 =================
 AUDIO_DIR = None  # 初始为空，由用户选择
@@ -66,10 +65,13 @@ btn_next.pack(pady=5)
 
 # ================= 音频播放逻辑 =================
 audio_files = []
-audio_data, sr = None, None
-is_playing = False
+file_positions = {}  # 文件名 -> 在 audio_files 中的位置
+loaded_file = None
 current_index = 0
-current_thread = None
+player = StreamPlayer()
+playback = PlaybackController(root, player, interval_ms=100)
+COMBO_WINDOW = 200  # 下拉框中当前文件前后各显示的条数
+image_cache = ImageCache(max_bytes=128 * 1024 * 1024)
 
 def load_spectrogram(filename):
     """加载语谱图"""
@@ -81,47 +83,35 @@ def load_spectrogram(filename):
         canvas.create_text(canvas.winfo_width()//2, canvas.winfo_height()//2,
                            text="⚠ 未找到对应语谱图", fill="white", font=("Arial", 16))
         return
-    img = Image.open(spec_path)
     w, h = canvas.winfo_width(), canvas.winfo_height()
-    img = img.resize((w, h), Image.LANCZOS)
+    img = image_cache.get(spec_path, (w, h), Image.LANCZOS)
     img_tk = ImageTk.PhotoImage(img)
     canvas.image = img_tk
     canvas.create_image(w//2, h//2, image=img_tk)
 
 def load_audio(filename):
-    """加载音频"""
-    global audio_data, sr
-    path = os.path.join(AUDIO_DIR, filename)
-    audio_data, sr = sf.read(path)
-    progress.set(0)
-
-def update_progress(duration):
-    """更新播放进度条"""
-    global is_playing
-    start_time = time.time()
-    while is_playing and time.time() - start_time <= duration:
-        elapsed = time.time() - start_time
-        progress.set((elapsed / duration) * 100)
-        time.sleep(0.1)
-    progress.set(100)
-    is_playing = False
-    btn_play.config(text="▶ 播放", bg="#007bff")
+    """加载音频（流式打开，不整体读入内存）"""
+    global loaded_file
+    playback.load(os.path.join(AUDIO_DIR, filename))
+    loaded_file = filename
+
+def on_playback_state(state):
+    if state == PlaybackController.PLAYING:
+        btn_play.config(text="⏸ 暂停", bg="#f39c12")
+    else:
+        btn_play.config(text="▶ 播放", bg="#007bff")
+
+def on_playback_position(seconds):
+    """更新播放进度条（只在播放期间由控制器调用，始终在 Tk 线程中）"""
+    if player.duration > 0:
+        progress.set(min(seconds / player.duration, 1) * 100)
 
 def play_audio():
-    global is_playing, current_thread
     if not audio_files:
         return
-    if not is_playing:
+    if loaded_file != audio_files[current_index]:
         load_audio(audio_files[current_index])
-        is_playing = True
-        sd.play(audio_data, sr)
-        btn_play.config(text="⏸ 暂停", bg="#f39c12")
-        current_thread = threading.Thread(target=update_progress, args=(len(audio_data)/sr,))
-        current_thread.start()
-    else:
-        sd.stop()
-        is_playing = False
-        btn_play.config(text="▶ 播放", bg="#007bff")
+    playback.toggle()
 
 def save_label(value):
     global current_index
@@ -137,41 +127,59 @@ def save_label(value):
     print(f"✅ 保存: {filename} -> {value}")
     next_file()  # 自动切换到下一首
 
+def update_combo():
+    """下拉框只放当前位置附近的文件，目录很大时也能正常使用"""
+    start = max(0, current_index - COMBO_WINDOW)
+    combo['values'] = audio_files[start:current_index + COMBO_WINDOW]
+    selected_file.set(audio_files[current_index])
+
+def select_file(name):
+    global current_index
+    if name not in file_positions:
+        return
+    current_index = file_positions[name]
+    update_combo()  # 以新位置为中心重新截取下拉框窗口
+    load_spectrogram(name)
+
 def next_file():
     global current_index
     if audio_files and current_index < len(audio_files) -1:
         current_index +=1
-        selected_file.set(audio_files[current_index])
+        update_combo()
         load_spectrogram(audio_files[current_index])
 
 def prev_file():
     global current_index
     if audio_files and current_index >0:
         current_index -=1
-        selected_file.set(audio_files[current_index])
+        update_combo()
         load_spectrogram(audio_files[current_index])
 
 def open_folder():
-    global AUDIO_DIR, SPEC_DIR, audio_files, current_index
+    global AUDIO_DIR, SPEC_DIR, audio_files, file_positions, current_index
     AUDIO_DIR = filedialog.askdirectory(title="选择音频文件夹")
     if not AUDIO_DIR:
         return
     SPEC_DIR = os.path.join(os.path.dirname(AUDIO_DIR),"spectrogram")
-    audio_files = sorted([f for f in os.listdir(AUDIO_DIR) if f.lower().endswith((".wav",".mp3"))])
+    manifest = Manifest(os.path.dirname(AUDIO_DIR), AUDIO_DIR, SPEC_DIR)
+    manifest.refresh()
+    audio_files = manifest.audio_files
+    file_positions = {name: i for i, name in enumerate(audio_files)}
     if not audio_files:
         return
     current_index = 0
-    selected_file.set(audio_files[0])
-    combo['values'] = audio_files
+    update_combo()
     load_spectrogram(audio_files[0])
 
 # ================= 绑定事件 =================
+playback.on_state = on_playback_state
+playback.on_position = on_playback_position
 btn_play.config(command=play_audio)
 btn_yes.config(command=lambda: save_label(1))
 btn_no.config(command=lambda: save_label(0))
 btn_next.config(command=next_file)
 btn_prev.config(command=prev_file)
 btn_open_folder.config(command=open_folder)
-combo.bind("<<ComboboxSelected>>", lambda e: load_spectrogram(selected_file.get()))
+combo.bind("<<ComboboxSelected>>", lambda e: select_file(selected_file.get()))
 
 root.mainloop()
\ No newline at end of file
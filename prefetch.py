@@ -0,0 +1,130 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageTk
+
+from image_cache import ImageCache
+from spectrogram import read_layout
+from wavmap import is_mappable
+
+AUDIO_PRELOAD_LIMIT = 32 * 1024 * 1024  # 超过此大小的音频不整体预读，播放时再从磁盘打开
+
+
+class PrefetchedClip:
+    """一条音频预取后的结果"""
+
+    def __init__(self, audio_path, spec_path, image, audio_data, error=None, layout=None):
+        self.audio_path = audio_path
+        self.spec_path = spec_path
+        self.image = image            # 已缩放的 PIL 图像，无语谱图时为 None
+        self.audio_data = audio_data  # 预读的音频字节；可内存映射的 WAV 或文件过大时为 None
+        self.error = error            # 语谱图或音频读取失败时的说明，界面据此提示
+        self.layout = layout          # 语谱图的行布局（spectrogram.read_layout），未知时为 None
+        self.photo = None             # ImageTk.PhotoImage，只能在 Tk 线程中创建
+
+
+def decode_clip(audio_path, spec_path, size, cache, engine=None):
+    """工作线程中执行：读取并缩放语谱图（经过 LRU 缓存，缺失时由 engine 生成），预读音频文件。
+
+    不抛出异常：损坏的 PNG、已删除的音频等都记在 error 中，界面照常显示并允许标注。
+    """
+    error = None
+    if engine is not None and not os.path.exists(spec_path):
+        try:
+            engine.ensure(audio_path, spec_path)
+        except (OSError, RuntimeError, ValueError):
+            pass  # 音频无法解码时按无语谱图处理
+    layout = None
+    try:
+        image = cache.get(spec_path, size)
+    except Exception as e:  # PIL 对损坏文件可能抛出 OSError、SyntaxError 等多种异常
+        image = None
+        error = f"语谱图无法读取: {e}"
+    else:
+        layout = read_layout(spec_path)
+    audio_data = None
+    # PCM WAV 播放时直接内存映射，不需要预读；其他格式小文件整体读入内存
+    try:
+        if not is_mappable(audio_path) and os.path.getsize(audio_path) <= AUDIO_PRELOAD_LIMIT:
+            with open(audio_path, "rb") as f:
+                audio_data = f.read()
+    except OSError as e:
+        error = f"音频无法读取: {e}"
+    return PrefetchedClip(audio_path, spec_path, image, audio_data, error, layout)
+
+
+class Prefetcher:
+    """在后台线程池中预取 current_index 前后 window 条音频，结果经 UiQueue 交回 Tk 线程。
+
+    除工作线程外，所有方法都只应在 Tk 线程中调用。
+    """
+
+    def __init__(self, ui, size=(800, 500), window=3, workers=2, cache=None, engine=None):
+        self.ui = ui
+        self.size = size
+        self.window = window
+        self.cache = cache if cache is not None else ImageCache()
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures = {}  # audio_path -> Future
+        self._waiters = {}  # audio_path -> [callback]
+        self._closed = False
+
+    def get(self, audio_path, spec_path, callback):
+        """获取一条音频；已预取完成则立即回调，否则解码完成后在 Tk 线程中回调"""
+        future = self._submit(audio_path, spec_path)
+        if future.done():
+            callback(self._result(future))
+        else:
+            self._waiters.setdefault(audio_path, []).append(callback)
+
+    def prefetch(self, index, count, path_for):
+        """预取 index 前后 window 条（循环翻页，与上一首/下一首一致），丢弃窗口外的结果"""
+        wanted = {}
+        for offset in range(self.window + 1):
+            # 先下一首方向、再上一首方向：下一首最常用
+            for i in ((index + offset) % count, (index - offset) % count):
+                audio_path, spec_path = path_for(i)
+                wanted[audio_path] = spec_path
+        for audio_path in list(self._futures):
+            if audio_path not in wanted and audio_path not in self._waiters:
+                self._futures.pop(audio_path).cancel()
+        for audio_path, spec_path in wanted.items():
+            self._submit(audio_path, spec_path)
+
+    def clear(self):
+        """切换文件夹时丢弃全部预取结果"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._waiters.clear()
+
+    def close(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ===== 内部实现 =====
+
+    def _submit(self, audio_path, spec_path):
+        future = self._futures.get(audio_path)
+        if future is None:
+            future = self._executor.submit(decode_clip, audio_path, spec_path, self.size, self.cache, self.engine)
+            self._futures[audio_path] = future
+            self.ui.when_done(future, self._on_done, audio_path)
+        return future
+
+    def _on_done(self, key, future):
+        if self._closed or future.cancelled() or self._futures.get(key) is not future:
+            return
+        callbacks = self._waiters.pop(key, [])
+        if not callbacks:
+            return
+        clip = self._result(future)
+        for callback in callbacks:
+            callback(clip)
+
+    def _result(self, future):
+        clip = future.result()
+        if clip.image is not None and clip.photo is None:
+            clip.photo = ImageTk.PhotoImage(clip.image)
+        return clip
@@ -0,0 +1,184 @@
+"""长录音的多分辨率语谱图金字塔。
+
+第 0 层每列约 1/COLUMNS_PER_SECOND 秒，往上每层对相邻两列取最大值、宽度减半，
+直到一层只剩一块。每层切成 TILE_COLUMNS 列一块的瓦片，保存为 uint8 的 dB 量化值（.npy），
+显示时按当前时间窗只读取可见的几块，着色后缩放到画布尺寸。
+
+目录结构：spectrogram/.tiles/<stem>/meta.json 与 <层>/<序号>.npy
+"""
+import json
+import math
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from spectrogram import COLORMAP, N_FFT, load_source, range_reader, stft_power
+
+PYRAMID_VERSION = 1
+PYRAMID_MIN_SECONDS = 60    # 超过此时长的音频使用瓦片金字塔，短音频仍显示单张语谱图
+TILE_COLUMNS = 512
+COLUMNS_PER_SECOND = 100
+ROWS = 256
+FIRST_BIN = 1               # 瓦片丢弃直流分量，最底行从频点 1 开始
+DB_FLOOR = -120.0           # 相对满幅正弦的 dB 下限
+DB_STEP = 0.5               # 量化步长，uint8 覆盖 127.5 dB
+
+
+def tiles_dir(spec_folder, audio_name):
+    return os.path.join(spec_folder, ".tiles", os.path.splitext(audio_name)[0])
+
+
+class _Range:
+    """音频 [start, stop) 采样的只读视图，供 stft_power 分块读取"""
+
+    def __init__(self, samples, start, stop):
+        self._read = range_reader(samples)
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def read_range(self, start, stop):
+        return self._read(self.start + start, min(self.start + stop, self.stop))
+
+
+def _quantize(power, pool, ref):
+    """(频点, 帧) 功率谱 -> (ROWS, 列) uint8：频率方向合并到 ROWS 行，时间方向每 pool 帧取最大值，低频在下"""
+    bins = power[FIRST_BIN:]  # 去掉直流分量，剩余 n_fft // 2 个频点
+    assert len(bins) % ROWS == 0, "n_fft // 2 必须是 ROWS 的整数倍"
+    bins = bins.reshape(ROWS, -1, bins.shape[1]).max(axis=1)
+    pad = -bins.shape[1] % pool
+    if pad:
+        bins = np.pad(bins, ((0, 0), (0, pad)))
+    bins = bins.reshape(ROWS, -1, pool).max(axis=2)
+    db = 10 * np.log10(np.maximum(bins / ref, 1e-20))
+    return np.clip((db - DB_FLOOR) / DB_STEP, 0, 255).astype(np.uint8)[::-1]
+
+
+def build_pyramid(audio_path, out_dir, n_fft=N_FFT, hop=256):
+    """生成 audio_path 的瓦片金字塔到 out_dir（先写临时目录再替换）。
+
+    第 0 层逐块计算 STFT，上层由下一层的相邻两块合并得到，任何时刻只有少量瓦片在内存中。
+    """
+    if (n_fft // 2) % ROWS:
+        raise ValueError(f"n_fft // 2 必须是 {ROWS} 的整数倍: n_fft={n_fft}")
+    samples, samplerate = load_source(audio_path)
+    length = len(samples)
+    n_frames = 1 + max(length - n_fft, 0) // hop
+    pool = max(1, round(samplerate / hop / COLUMNS_PER_SECOND))
+    tile_frames = TILE_COLUMNS * pool
+    columns = -(-n_frames // pool)
+    # 满幅正弦在 Hann 窗下的峰值功率，作为 0 dB 参考
+    ref = (np.hanning(n_fft).sum() / 2) ** 2
+
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, "0"))
+    peak = 0
+    n_tiles = -(-columns // TILE_COLUMNS)
+    for i in range(n_tiles):
+        start = i * tile_frames * hop
+        stop = min(start + (tile_frames - 1) * hop + n_fft, length)
+        power = stft_power(_Range(samples, start, stop), n_fft, hop, max_width=0)
+        tile = _quantize(power, pool, ref)
+        peak = max(peak, int(tile.max()))
+        np.save(os.path.join(tmp_dir, "0", f"{i}.npy"), tile)
+
+    level = 0
+    while n_tiles > 1:
+        level += 1
+        os.makedirs(os.path.join(tmp_dir, str(level)))
+        for i in range(-(-n_tiles // 2)):
+            parts = [np.load(os.path.join(tmp_dir, str(level - 1), f"{j}.npy"))
+                     for j in (2 * i, 2 * i + 1) if j < n_tiles]
+            merged = np.concatenate(parts, axis=1)
+            if merged.shape[1] % 2:
+                merged = np.pad(merged, ((0, 0), (0, 1)))
+            np.save(os.path.join(tmp_dir, str(level), f"{i}.npy"), merged.reshape(ROWS, -1, 2).max(axis=2))
+        n_tiles = -(-n_tiles // 2)
+
+    st = os.stat(audio_path)
+    meta = {
+        "version": PYRAMID_VERSION,
+        "audio_size": st.st_size,
+        "audio_mtime_ns": st.st_mtime_ns,
+        "samplerate": samplerate,
+        "n_fft": n_fft,
+        "seconds_per_column": pool * hop / samplerate,
+        "columns": columns,
+        "levels": level + 1,
+        "peak": peak,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+def pyramid_up_to_date(audio_path, out_dir):
+    try:
+        with open(os.path.join(out_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        st = os.stat(audio_path)
+    except (OSError, ValueError):
+        return False
+    return (meta.get("version") == PYRAMID_VERSION and meta.get("audio_size") == st.st_size
+            and meta.get("audio_mtime_ns") == st.st_mtime_ns)
+
+
+class Pyramid:
+    """已生成的瓦片金字塔。瓦片按需读取并保存在容量固定的 LRU 中，内存占用与录音长度无关"""
+
+    def __init__(self, out_dir, max_tiles=64):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.seconds_per_column = meta["seconds_per_column"]
+        self.columns = meta["columns"]
+        self.levels = meta["levels"]
+        self.peak = meta["peak"]
+        self.n_fft = meta.get("n_fft", N_FFT)
+        self.duration = self.columns * self.seconds_per_column
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()  # (层, 序号) -> ndarray
+
+    def level_for(self, seconds_per_pixel):
+        """每列不细于一个像素的最精细层"""
+        if seconds_per_pixel <= self.seconds_per_column:
+            return 0
+        return min(int(math.log2(seconds_per_pixel / self.seconds_per_column)), self.levels - 1)
+
+    def tile(self, level, index):
+        key = (level, index)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        tile = np.load(os.path.join(self.out_dir, str(level), f"{index}.npy"))
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def render(self, start, seconds, width, height, top_db=80.0, colormap=COLORMAP):
+        """渲染 [start, start + seconds) 秒到 width x height 的 RGB 图像，只读取可见的瓦片"""
+        level = self.level_for(seconds / max(width, 1))
+        spc = self.seconds_per_column * 2 ** level
+        level_columns = -(-self.columns // 2 ** level)
+        c0 = min(max(int(start / spc), 0), level_columns - 1)
+        c1 = min(max(math.ceil((start + seconds) / spc), c0 + 1), level_columns)
+        tiles = [self.tile(level, i) for i in range(c0 // TILE_COLUMNS, (c1 - 1) // TILE_COLUMNS + 1)]
+        offset = c0 // TILE_COLUMNS * TILE_COLUMNS
+        q = np.concatenate(tiles, axis=1)[:, c0 - offset:c1 - offset]
+        # 以整段录音的峰值为上限，量化值经查找表直接映射为颜色
+        levels = len(colormap) - 1
+        span = top_db / DB_STEP
+        lut = colormap[np.clip((np.arange(256) - (self.peak - span)) / span * levels, 0, levels).astype(np.uint8)]
+        img = Image.fromarray(lut[q], "RGB")
+        box = (start / spc - c0, 0, min((start + seconds) / spc, c1) - c0, ROWS)
+        return img.resize((max(width, 1), max(height, 1)), box=box)
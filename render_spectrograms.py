@@ -0,0 +1,71 @@
+"""批量生成语谱图：遍历 audio/，用多进程把缺失或过期的 <stem>.png 写入 spectrogram/。
+加 --pyramids 时同时为长录音预先生成瓦片金字塔（spectrogram/.tiles/）。
+
+用法：
+    python render_spectrograms.py 数据集目录 [--workers N] [--force] [--pyramids]
+"""
+import argparse
+import os
+import sys
+
+from audio_info import audio_duration
+from batch import Batch
+from manifest import AUDIO_EXTENSIONS, scan_folder
+from pyramid import PYRAMID_MIN_SECONDS, build_pyramid, pyramid_up_to_date, tiles_dir
+from spectrogram import is_up_to_date, render_spectrogram
+
+
+def render_one(task):
+    """子进程中执行，返回 (文件名, 错误信息或 None)；不需要生成的部分为 None"""
+    audio_path, spec_path, pyramid_path = task
+    try:
+        if spec_path is not None:
+            render_spectrogram(audio_path, spec_path)
+        if pyramid_path is not None:
+            build_pyramid(audio_path, pyramid_path)
+    except (OSError, RuntimeError, ValueError) as e:
+        return os.path.basename(audio_path), str(e)
+    return os.path.basename(audio_path), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成 spectrogram/ 下的语谱图 PNG")
+    parser.add_argument("dataset", help="包含 audio/ 的数据集目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="进程数（默认全部核心）")
+    parser.add_argument("--force", action="store_true", help="忽略修改时间，全部重新生成")
+    parser.add_argument("--pyramids", action="store_true",
+                        help=f"为长于 {PYRAMID_MIN_SECONDS} 秒的录音生成瓦片金字塔")
+    args = parser.parse_args(argv)
+
+    audio_folder = os.path.join(args.dataset, "audio")
+    spec_folder = os.path.join(args.dataset, "spectrogram")
+    if not os.path.isdir(audio_folder):
+        parser.error(f"未找到 {audio_folder}")
+    os.makedirs(spec_folder, exist_ok=True)
+
+    tasks = []
+    for name in scan_folder(audio_folder, AUDIO_EXTENSIONS):
+        audio_path = os.path.join(audio_folder, name)
+        spec_path = os.path.join(spec_folder, os.path.splitext(name)[0] + ".png")
+        if not args.force and is_up_to_date(audio_path, spec_path):
+            spec_path = None
+        pyramid_path = None
+        if args.pyramids and audio_duration(audio_path) >= PYRAMID_MIN_SECONDS:
+            pyramid_path = tiles_dir(spec_folder, name)
+            if not args.force and pyramid_up_to_date(audio_path, pyramid_path):
+                pyramid_path = None
+        if spec_path is not None or pyramid_path is not None:
+            tasks.append((audio_path, spec_path, pyramid_path))
+    print(f"共需生成 {len(tasks)} 张语谱图，{args.workers} 个进程")
+    if not tasks:
+        return 0
+
+    failed = []
+    batch = Batch(render_one, tasks, args.workers, chunksize=8)
+    for name, error in batch:
+        if error is not None:
+            failed.append((name, error))
+    return batch.report(failed)
+
+if __name__ == "__main__":
+    sys.exit(main())
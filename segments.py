@@ -0,0 +1,124 @@
+import bisect
+from collections import namedtuple
+
+from label_store import JournalStore
+
+# 时间单位为秒；fmin/fmax 为频带（Hz），整段频率时为 None
+Segment = namedtuple("Segment", "start end fmin fmax label")
+
+
+class IntervalIndex:
+    """静态区间索引：区间按起点排序，隐式二叉树的每个节点记录子树内的最大终点。
+
+    查询与 [lo, hi] 重叠的区间时，起点 > hi 的部分直接用二分排除，
+    最大终点 < lo 的子树整棵跳过，复杂度 O(log n + k)。
+    """
+
+    def __init__(self, segments):
+        self.segments = sorted(segments, key=lambda s: (s.start, s.end))
+        self._starts = [s.start for s in self.segments]
+        n = len(self.segments)
+        self._size = 1
+        while self._size < n:
+            self._size *= 2
+        # 满二叉树数组：叶子在 [size, size + n)，内部节点为子节点最大终点
+        self._max_end = [float("-inf")] * (2 * self._size)
+        for i, s in enumerate(self.segments):
+            self._max_end[self._size + i] = s.end
+        for node in range(self._size - 1, 0, -1):
+            self._max_end[node] = max(self._max_end[2 * node], self._max_end[2 * node + 1])
+
+    def __len__(self):
+        return len(self.segments)
+
+    def query(self, lo, hi):
+        """返回与 [lo, hi] 重叠的区间（按起点排序）"""
+        limit = bisect.bisect_right(self._starts, hi)  # 只有前 limit 个区间的起点 <= hi
+        if limit == 0:
+            return []
+        result = []
+        stack = [(1, 0, self._size)]
+        while stack:
+            node, left, right = stack.pop()
+            if left >= limit or self._max_end[node] < lo:
+                continue
+            if node >= self._size:
+                result.append(self.segments[left])
+                continue
+            mid = (left + right) // 2
+            stack.append((2 * node + 1, mid, right))
+            stack.append((2 * node, left, mid))
+        return result
+
+
+class SegmentStore(JournalStore):
+    """区间标注存储（CSV：file,start,end,fmin,fmax,label）。
+
+    日志每行为 op 加一行 CSV 字段，op 为 +（新增）或 -（删除）。
+    每个文件的区间索引按需建立，修改后失效重建。
+    """
+
+    HEADER = ["file", "start", "end", "fmin", "fmax", "label"]
+
+    def __init__(self, csv_path, compact_every=500):
+        self._segments = {}  # file -> [Segment]
+        self._indexes = {}   # file -> IntervalIndex
+        super().__init__(csv_path, compact_every)
+
+    def _load_row(self, row):
+        self._segments.setdefault(row["file"], []).append(_parse([row[name] for name in self.HEADER[1:]]))
+
+    def _replay_row(self, row):
+        if len(row) != 7 or row[0] not in ("+", "-"):
+            return  # 崩溃时写了一半的行直接丢弃
+        try:
+            segment = _parse(row[2:])
+        except ValueError:
+            return
+        segments = self._segments.setdefault(row[1], [])
+        if row[0] == "+":
+            segments.append(segment)
+        elif segment in segments:
+            segments.remove(segment)
+
+    def _rows(self):
+        return [_row(name, s) for name, items in self._segments.items() for s in items]
+
+    def index(self, file_name):
+        idx = self._indexes.get(file_name)
+        if idx is None:
+            idx = IntervalIndex(self._segments.get(file_name, []))
+            self._indexes[file_name] = idx
+        return idx
+
+    def add(self, file_name, segment):
+        # 按写入 CSV 的精度保存，重启后读回的区间与内存中完全相同，删除时才能匹配
+        row = _row(file_name, segment)
+        with self._lock:
+            self._segments.setdefault(file_name, []).append(_parse(row[1:]))
+            self._indexes.pop(file_name, None)
+            self._log(["+"] + row)
+
+    def remove(self, file_name, segment):
+        with self._lock:
+            segments = self._segments.get(file_name, [])
+            if segment not in segments:
+                return
+            segments.remove(segment)
+            self._indexes.pop(file_name, None)
+            self._log(["-"] + _row(file_name, segment))
+
+
+def _parse(fields):
+    """CSV 中的 start,end,fmin,fmax,label -> Segment"""
+    start, end, fmin, fmax, label = fields
+    return Segment(float(start), float(end), _optional_float(fmin), _optional_float(fmax), label)
+
+
+def _optional_float(text):
+    return float(text) if text not in ("", None) else None
+
+
+def _row(file_name, s):
+    return [file_name, f"{s.start:.4f}", f"{s.end:.4f}",
+            "" if s.fmin is None else f"{s.fmin:.1f}", "" if s.fmax is None else f"{s.fmax:.1f}", s.label]
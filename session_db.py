@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+from annotations import INSERT_ANNOTATION, AnnotationStore
+
+SESSION_FILE = "session.db"
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    file            TEXT PRIMARY KEY,
+    position        INTEGER,
+    has_spectrogram INTEGER NOT NULL DEFAULT 0,
+    duration        REAL
+);
+CREATE INDEX IF NOT EXISTS clips_position ON clips (position);
+CREATE TABLE IF NOT EXISTS history (
+    id     INTEGER PRIMARY KEY,
+    ts     REAL NOT NULL,
+    file   TEXT NOT NULL,
+    action TEXT NOT NULL
+);
+"""
+
+
+class SessionDB(AnnotationStore):
+    """数据集会话库（SQLite，WAL 模式）：清单、时长、标注与浏览历史放在同一个文件中。
+
+    标注接口与 AnnotationStore 相同，但每条标注都是一个独立的写事务（连同一条 "label" 历史事件），
+    写线程批量写入时也逐条提交：崩溃后已提交的标注不会丢失，也没有整文件重写。
+    """
+
+    def __init__(self, db_path, annotator, classes=None):
+        super().__init__(db_path, annotator, classes)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SESSION_SCHEMA)
+
+    def set(self, file_name, label, flush=True, confidence=None):
+        """写入一条标注并立即提交；flush 参数只为与 LabelStore 接口一致，不起作用"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._labels[file_name] = str(label)
+            self._conn.execute(INSERT_ANNOTATION, (file_name, self.annotator, str(label), confidence, now))
+            self._conn.execute("INSERT INTO history (ts, file, action) VALUES (?, ?, ?)",
+                               (now, file_name, "label"))
+
+    # ===== 清单与时长 =====
+
+    def sync_manifest(self, audio_files, has_spectrogram):
+        """用当前文件列表更新 clips 表，保留已记录的时长"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE clips SET position = NULL")
+            self._conn.executemany(
+                "INSERT INTO clips (file, position, has_spectrogram) VALUES (?, ?, ?) "
+                "ON CONFLICT (file) DO UPDATE SET position = excluded.position, "
+                "has_spectrogram = excluded.has_spectrogram",
+                ((name, i, int(has_spectrogram(name))) for i, name in enumerate(audio_files)))
+            self._conn.execute("DELETE FROM clips WHERE position IS NULL")
+
+    def store_durations(self, durations):
+        """durations: {文件名: 秒}。可在后台线程中调用，会话已关闭时忽略"""
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany("UPDATE clips SET duration = ? WHERE file = ?",
+                                       ((d, name) for name, d in durations.items()))
+        except sqlite3.ProgrammingError:
+            pass
+
+    def mark_spectrogram(self, file_name):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE clips SET has_spectrogram = 1 WHERE file = ?", (file_name,))
+
+    # ===== 查询 =====
+
+    def count_remaining(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM clips c WHERE NOT EXISTS "
+                "(SELECT 1 FROM annotations a WHERE a.file = c.file AND a.annotator = ?)",
+                (self.annotator,)).fetchone()[0]
+
+    # ===== 浏览历史 =====
+
+    def log_event(self, file_name, action):
+        """记录一次浏览/播放事件（标注事件由 set 在同一事务中记录）"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO history (ts, file, action) VALUES (?, ?, ?)",
+                               (time.time(), file_name, action))
+
+    def log_events(self, file_names, action):
+        """批量记录同一动作（一个事务）"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO history (ts, file, action) VALUES (?, ?, ?)",
+                                   ((now, name, action) for name in file_names))
+
+    def last_file(self):
+        """上次会话最后浏览的文件"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file FROM history WHERE action = 'view' ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+from PIL import Image, PngImagePlugin
+
+from wavmap import WavMap, is_mappable
+
+# viridis 色表的 11 个锚点（0.0, 0.1, ..., 1.0），线性插值成 256 级查找表
+_VIRIDIS_ANCHORS = np.array([
+    (68, 1, 84), (72, 36, 117), (65, 68, 135), (53, 95, 141), (42, 120, 142), (33, 145, 140),
+    (34, 168, 132), (68, 191, 112), (122, 209, 81), (189, 223, 38), (253, 231, 37),
+], dtype=np.float64)
+
+N_FFT = 1024  # 默认帧长：图像共 N_FFT // 2 + 1 行（频点 0 到奈奎斯特频率）
+LAYOUT_KEY = "spectrogram-layout"  # 生成的 PNG 中记录行布局的文本块
+
+
+def build_colormap(anchors=_VIRIDIS_ANCHORS, levels=256):
+    """由锚点颜色生成 levels x 3 的 uint8 查找表"""
+    x = np.linspace(0, 1, len(anchors))
+    t = np.linspace(0, 1, levels)
+    return np.stack([np.interp(t, x, anchors[:, c]) for c in range(3)], axis=1).round().astype(np.uint8)
+
+
+COLORMAP = build_colormap()
+
+
+def load_mono(path):
+    """读取音频并混合为单声道 float32"""
+    data, samplerate = sf.read(path, dtype="float32", always_2d=True)
+    return data.mean(axis=1), samplerate
+
+
+def load_source(path):
+    """PCM / 浮点 WAV 返回内存映射视图（按块读取），其他格式整体解码为单声道数组"""
+    if is_mappable(path):
+        wav = WavMap(path)
+        return wav, wav.samplerate
+    return load_mono(path)
+
+
+def range_reader(samples):
+    """返回 read(start, stop)：WavMap 只读取并转换所需的帧，数组直接切片"""
+    if hasattr(samples, "read_range"):
+        return samples.read_range
+    return lambda start, stop: samples[start:stop]
+
+
+def frame_blocks(samples, n_fft=N_FFT, chunk_frames=256):
+    """分块读取音频并混合为单声道，逐块产出 (块, 功率谱)，内存占用与时长无关。
+
+    每块 n_fft * chunk_frames 个采样；功率谱为块内完整的不重叠帧加 Hann 窗后的 |FFT|²，
+    形状 (帧, n_fft // 2 + 1)，块内不足一帧时为 0 行。
+    """
+    read = range_reader(samples)
+    window = np.hanning(n_fft).astype(np.float32)
+    step = n_fft * chunk_frames
+    for start in range(0, len(samples), step):
+        block = np.asarray(read(start, start + step), dtype=np.float32)
+        if block.ndim == 2:
+            block = block.mean(axis=1)
+        whole = len(block) // n_fft * n_fft
+        power = np.abs(np.fft.rfft(block[:whole].reshape(-1, n_fft) * window, axis=1)) ** 2
+        yield block, power
+
+
+def stft_power(samples, n_fft=N_FFT, hop=256, max_width=2048, chunk_frames=4096):
+    """用 NumPy 分块计算功率谱，返回 (频点, 帧) 数组。
+
+    samples 可以是单声道数组，也可以是 WavMap（每块只读取并转换所需的采样）。
+    帧数超过 max_width 时按整数倍对相邻帧取最大值合并，
+    内存占用只与 chunk_frames 与 max_width 有关，与音频长度无关。
+    """
+    read = range_reader(samples)
+    length = len(samples)
+    n_frames = 1 + max(length - n_fft, 0) // hop
+    pool = max(1, -(-n_frames // max_width)) if max_width else 1
+    chunk_frames = max(pool, chunk_frames // pool * pool)
+    window = np.hanning(n_fft).astype(np.float32)
+
+    columns = []
+    for start in range(0, n_frames, chunk_frames):
+        count = min(chunk_frames, n_frames - start)
+        block = np.asarray(read(start * hop, (start + count - 1) * hop + n_fft), dtype=np.float32)
+        if block.ndim == 2:
+            block = block.mean(axis=1)
+        if len(block) < (count - 1) * hop + n_fft:
+            block = np.pad(block, (0, (count - 1) * hop + n_fft - len(block)))
+        frames = np.lib.stride_tricks.sliding_window_view(block, n_fft)[::hop] * window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        if pool > 1:
+            pad = -len(power) % pool
+            if pad:
+                power = np.concatenate([power, np.zeros((pad, power.shape[1]), power.dtype)])
+            power = power.reshape(-1, pool, power.shape[1]).max(axis=1)
+        columns.append(power)
+    return np.concatenate(columns).T
+
+
+def spectrogram_image(samples, n_fft=N_FFT, hop=256, max_width=2048, top_db=80.0, colormap=COLORMAP):
+    """把音频（数组或 WavMap）转为语谱图 PIL 图像：低频在下，dB 经查找表直接映射为颜色"""
+    power = stft_power(samples, n_fft, hop, max_width)
+    db = 10 * np.log10(np.maximum(power, 1e-12))
+    peak = db.max()
+    levels = len(colormap) - 1
+    index = np.clip((db - (peak - top_db)) / top_db * levels, 0, levels).astype(np.uint8)
+    return Image.fromarray(colormap[index[::-1]], "RGB")
+
+
+def row_to_hz(fraction, samplerate, n_fft=N_FFT, first_bin=0):
+    """语谱图纵向位置（0 为顶端，1 为底端）-> 频率（Hz）。
+
+    图像自下而上每行对应一个（或一组相邻的）STFT 频点，频点 k 的中心频率为 k * samplerate / n_fft；
+    first_bin 为最底行的第一个频点（整图为 0，丢弃直流分量的金字塔瓦片为 1）。
+    """
+    n_bins = n_fft // 2 + 1 - first_bin
+    k = first_bin - 0.5 + (1.0 - fraction) * n_bins
+    return min(max(k * samplerate / n_fft, 0.0), samplerate / 2)
+
+
+def hz_to_row(hz, samplerate, n_fft=N_FFT, first_bin=0):
+    """row_to_hz 的反函数：频率（Hz）-> 纵向位置（0 为顶端，1 为底端）"""
+    n_bins = n_fft // 2 + 1 - first_bin
+    return 1.0 - (hz * n_fft / samplerate - first_bin + 0.5) / n_bins
+
+
+def is_up_to_date(audio_path, spec_path):
+    try:
+        return os.path.getmtime(spec_path) >= os.path.getmtime(audio_path)
+    except OSError:
+        return False
+
+
+def read_layout(spec_path):
+    """本工具生成的语谱图返回行布局 {"n_fft": ..., "first_bin": ...}（见 row_to_hz）；
+    数据集自带的 PNG 坐标含义未知，返回 None"""
+    try:
+        with Image.open(spec_path) as img:
+            layout = json.loads(img.info[LAYOUT_KEY])
+        return {"n_fft": int(layout["n_fft"]), "first_bin": int(layout["first_bin"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def render_spectrogram(audio_path, spec_path, **kwargs):
+    """生成语谱图并写入 spec_path（先写临时文件再替换，避免读到半个 PNG）；
+    PNG 文本块中记录行布局，供 read_layout 换算频率"""
+    samples, _ = load_source(audio_path)
+    img = spectrogram_image(samples, **kwargs)
+    info = PngImagePlugin.PngInfo()
+    info.add_text(LAYOUT_KEY, json.dumps({"n_fft": kwargs.get("n_fft", N_FFT), "first_bin": 0}))
+    tmp_path = spec_path + ".tmp"
+    # 噪声为主的语谱图压缩收益很小，低压缩级别可把编码时间缩短到约 1/4
+    img.save(tmp_path, format="PNG", compress_level=1, pnginfo=info)
+    os.replace(tmp_path, spec_path)
+    return spec_path
+
+
+class SpectrogramEngine:
+    """后台生成缺失的语谱图（以及长录音的瓦片金字塔），结果写入 spectrogram/ 作为缓存，每条音频只计算一次。
+
+    同一输出路径的重复请求共用一个任务。
+    """
+
+    def __init__(self, workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._jobs = {}  # 输出路径 -> Future
+        self._lock = threading.Lock()
+
+    def submit(self, audio_path, spec_path):
+        return self._submit(spec_path, render_spectrogram, audio_path, spec_path)
+
+    def submit_pyramid(self, audio_path, out_dir):
+        """生成瓦片金字塔，返回 Future"""
+        from pyramid import build_pyramid  # pyramid 依赖本模块，延迟导入避免循环
+        return self._submit(out_dir, build_pyramid, audio_path, out_dir)
+
+    def ensure(self, audio_path, spec_path):
+        """阻塞直到语谱图存在（在工作线程中调用）"""
+        if not os.path.exists(spec_path):
+            self.submit(audio_path, spec_path).result()
+        return spec_path
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, key, fn, *args):
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(fn, *args)
+            self._jobs[key] = future
+        # 在锁外注册：任务已经结束（例如文件不存在立即失败）时回调会同步执行，_forget 需要再次获取锁
+        future.add_done_callback(lambda f, key=key: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._jobs.get(key) is future:
+                del self._jobs[key]
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_info import audio_duration, parse_mp3_frame_header, read_wav_info, wav_duration
+from wavmap import WavMap, is_mappable, open_audio
+
+SAMPLERATE = 8000
+
+
+def write_wav(path, subtype, channels=2, frames=4000):
+    rng = np.random.default_rng(0)
+    samples = (rng.uniform(-0.9, 0.9, (frames, channels))).astype(np.float32)
+    sf.write(path, samples, SAMPLERATE, subtype=subtype)
+    return path
+
+
+@pytest.mark.parametrize("subtype", ["PCM_U8", "PCM_16", "PCM_24", "PCM_32", "FLOAT", "DOUBLE"])
+def test_wavmap_matches_soundfile(tmp_path, subtype):
+    path = write_wav(str(tmp_path / "a.wav"), subtype)
+    assert is_mappable(path)
+    expected, _ = sf.read(path, dtype="float32", always_2d=True)
+    wav = WavMap(path)
+    assert (wav.samplerate, wav.channels, len(wav)) == (SAMPLERATE, 2, 4000)
+    np.testing.assert_allclose(wav.read_range(0, len(wav)), expected, atol=1e-6)
+    wav.seek(1000)
+    np.testing.assert_allclose(wav.read(500), expected[1000:1500], atol=1e-6)
+    assert wav.tell() == 1500
+    assert wav_duration(path) == 0.5
+
+
+def test_interrupted_recording_uses_actual_data_length(tmp_path):
+    path = write_wav(str(tmp_path / "a.wav"), "PCM_16", channels=1)
+    data = open(path, "rb").read()
+    (tmp_path / "cut.wav").write_bytes(data[:-1000])  # data 块声明的长度大于实际文件
+    info = read_wav_info(str(tmp_path / "cut.wav"))
+    assert info.data_size == 8000 - 1000
+    assert len(WavMap(str(tmp_path / "cut.wav"))) == 3500
+
+
+@pytest.mark.parametrize("length", [0, 6, 11, 12, 19, 30, 44])
+def test_truncated_header_raises_value_error(tmp_path, length):
+    data = open(write_wav(str(tmp_path / "a.wav"), "PCM_16"), "rb").read()
+    path = tmp_path / "cut.wav"
+    path.write_bytes(data[:length])
+    if length < 44:
+        with pytest.raises(ValueError):
+            read_wav_info(str(path))
+    else:
+        assert read_wav_info(str(path)).data_size == 0
+    assert audio_duration(str(path)) == 0.0
+    assert is_mappable(str(path)) == (length >= 44)
+
+
+def test_short_fmt_chunk_raises_value_error(tmp_path):
+    path = tmp_path / "bad.wav"
+    path.write_bytes(b"RIFF\x20\x00\x00\x00WAVEfmt \x08\x00\x00\x00\x01\x00\x02\x00\x40\x1f\x00\x00")
+    with pytest.raises(ValueError):
+        read_wav_info(str(path))
+    assert not is_mappable(str(path))
+
+
+def test_zero_channel_wav_is_not_mappable(tmp_path):
+    path = tmp_path / "zero.wav"
+    fmt = (1).to_bytes(2, "little") + (0).to_bytes(2, "little") + (8000).to_bytes(4, "little") \
+        + (0).to_bytes(4, "little") + (0).to_bytes(2, "little") + (16).to_bytes(2, "little")
+    path.write_bytes(b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00" + fmt + b"data\x00\x00\x00\x00")
+    assert not is_mappable(str(path))
+
+
+def test_open_audio_falls_back_to_soundfile(tmp_path):
+    path = str(tmp_path / "a.wav")
+    sf.write(path, np.zeros((100, 1), np.float32), SAMPLERATE, subtype="PCM_S8", format="AIFF")
+    assert not is_mappable(path)  # 扩展名为 .wav 但内容不是 WAV
+    with open_audio(path) as f:
+        assert f.frames == 100
+
+
+def test_parse_mp3_frame_header():
+    # MPEG-1 Layer III，128 kbps，44100 Hz，立体声
+    frame = parse_mp3_frame_header(bytes([0xFF, 0xFB, 0x90, 0x00]))
+    assert (frame.version, frame.layer, frame.samplerate, frame.samples) == (1, 3, 44100, 1152)
+    assert frame.length == 417 and not frame.mono
+    assert parse_mp3_frame_header(b"\xff\xfb") is None
+    assert parse_mp3_frame_header(bytes([0xFF, 0xFB, 0xF0, 0x00])) is None  # 码率索引 15 为保留值
+
+
+@pytest.mark.parametrize("data, seconds", [
+    (b"", 0.0),
+    (b"ID3\x04\x00", 0.0),               # 标签头不完整
+    (b"\xff\xfb\x90\x00\x00", 1152 / 44100),  # 只有一帧的帧头，帧体被截断
+])
+def test_truncated_mp3_duration(tmp_path, data, seconds):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(data)
+    assert audio_duration(str(path)) == pytest.approx(seconds)
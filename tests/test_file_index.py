@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from features import FEATURES, FeatureIndex
+from file_index import save_cache
+
+
+def make_dataset(tmp_path, *names):
+    audio = tmp_path / "audio"
+    audio.mkdir()
+    for name in names:
+        (audio / name).write_bytes(b"x")
+    return str(tmp_path), str(audio)
+
+
+def test_save_cache_replaces_atomically(tmp_path):
+    path = str(tmp_path / "cache.txt")
+    assert save_cache(path, lambda tmp: open(tmp, "w").write("new"))
+    assert open(path).read() == "new"
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_save_cache_reports_unwritable_folder(tmp_path):
+    assert not save_cache(str(tmp_path / "missing" / "cache.txt"), lambda tmp: open(tmp, "w").write("x"))
+
+
+def test_index_round_trip_and_staleness(tmp_path):
+    dataset, audio = make_dataset(tmp_path, "a.wav", "b.wav")
+    index = FeatureIndex(dataset, audio)
+    assert index.stale(["a.wav", "b.wav", "gone.wav"]) == ["a.wav", "b.wav"]
+    index.update("a.wav", range(len(FEATURES)))
+    index.save()
+
+    reloaded = FeatureIndex(dataset, audio)
+    assert len(reloaded) == 1
+    assert reloaded.get("a.wav")["peak_db"] == 1.0
+    assert reloaded.stale(["a.wav", "b.wav"]) == ["b.wav"]
+    (tmp_path / "audio" / "a.wav").write_bytes(b"changed")  # 大小变化后失效
+    assert reloaded.stale(["a.wav"]) == ["a.wav"]
+
+
+def test_index_with_other_feature_list_is_discarded(tmp_path):
+    dataset, audio = make_dataset(tmp_path, "a.wav")
+    np.savez(tmp_path / FeatureIndex.FILE_NAME, features=np.array(["old"]), files=np.array(["a.wav"]),
+             size=np.array([1]), mtime_ns=np.array([0]), values=np.zeros((1, 1), np.float32))
+    assert len(FeatureIndex(dataset, audio)) == 0
+
+
+def test_corrupt_index_is_ignored(tmp_path):
+    dataset, audio = make_dataset(tmp_path, "a.wav")
+    (tmp_path / FeatureIndex.FILE_NAME).write_bytes(b"not an npz")
+    assert len(FeatureIndex(dataset, audio)) == 0
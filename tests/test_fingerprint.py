@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from fingerprint import FingerprintIndex, MultiIndexHash, fingerprint, group_duplicates
+
+
+def flip(h, *bits):
+    for bit in bits:
+        h ^= 1 << bit
+    return h
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def test_empty_input():
+    assert group_duplicates([], []) == []
+    assert MultiIndexHash([]).neighbours(123) == []
+
+
+@pytest.mark.parametrize("radius", [0, 1, 3, 5])
+def test_neighbours_match_brute_force(radius):
+    rng = random.Random(radius)
+    hashes = []
+    for _ in range(300):
+        if hashes and rng.random() < 0.5:
+            # 在已有指纹附近放置近重复，距离可能在半径内外
+            hashes.append(flip(rng.choice(hashes), *rng.sample(range(64), rng.randint(0, radius + 2))))
+        else:
+            hashes.append(rng.getrandbits(64))
+    index = MultiIndexHash(hashes, radius)
+    for h in hashes[:100] + [rng.getrandbits(64) for _ in range(20)]:
+        expected = sorted(i for i, other in enumerate(hashes) if distance(h, other) <= radius)
+        assert sorted(index.neighbours(h)) == expected
+
+
+def test_groups_are_transitive():
+    base = 0x0123456789ABCDEF
+    chain = [base, flip(base, 0, 1, 2), flip(base, 0, 1, 2, 10, 11, 12)]
+    assert distance(chain[0], chain[2]) > 3  # 两端不相近，经中间一条连成一组
+    unrelated = flip(base, *range(20, 40))
+    groups = group_duplicates(["a", "b", "c", "d"], chain + [unrelated], radius=3)
+    assert [sorted(g) for g in groups] == [["a", "b", "c"]]
+
+
+def test_exact_duplicates_and_singletons():
+    groups = group_duplicates(["a", "b", "c", "d"], [1, 2 ** 63, 1, 2 ** 63 + 2 ** 40], radius=0)
+    assert sorted(sorted(g) for g in groups) == [["a", "c"]]
+
+
+def test_fingerprint_ignores_volume(tmp_path):
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(16000 * 2) * np.linspace(0.1, 1, 32000)).astype(np.float32) * 0.3
+    sf.write(tmp_path / "a.wav", samples, 16000)
+    sf.write(tmp_path / "b.wav", samples * 0.5, 16000)
+    assert distance(fingerprint(str(tmp_path / "a.wav")), fingerprint(str(tmp_path / "b.wav"))) <= 3
+
+
+def test_index_round_trip_keeps_64_bit_hashes(tmp_path):
+    (tmp_path / "audio").mkdir()
+    for name in ("a.wav", "b.wav"):
+        (tmp_path / "audio" / name).write_bytes(b"x")
+    index = FingerprintIndex(str(tmp_path), str(tmp_path / "audio"))
+    index.update("a.wav", 2 ** 64 - 1)
+    index.update("b.wav", 2 ** 64 - 1)
+    index.save()
+    reloaded = FingerprintIndex(str(tmp_path), str(tmp_path / "audio"))
+    assert reloaded.stale(["a.wav", "b.wav"]) == []
+    assert reloaded.groups(["a.wav", "b.wav"], radius=0) == [["a.wav", "b.wav"]]
@@ -0,0 +1,86 @@
+import csv
+
+from label_store import LabelStore, LabelWriter
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [tuple(row) for row in csv.reader(f)]
+
+
+def test_set_appends_journal_and_get(tmp_path):
+    store = LabelStore(str(tmp_path / "labels.csv"))
+    store.set("a.wav", "1")
+    store.set("b.wav", "0")
+    assert store.get("a.wav") == "1"
+    assert "b.wav" in store and len(store) == 2
+    assert read_csv(store.journal_path) == [("a.wav", "1"), ("b.wav", "0")]
+    store.close()
+
+
+def test_close_compacts_into_csv_and_removes_journal(tmp_path):
+    path = tmp_path / "labels.csv"
+    store = LabelStore(str(path))
+    store.set("a.wav", "1")
+    store.set("b.wav", "0")
+    store.set("a.wav", "0")  # 重新标注的行移到末尾
+    store.close()
+    assert read_csv(path) == [("file", "label"), ("b.wav", "0"), ("a.wav", "0")]
+    assert not (tmp_path / "labels.csv.journal").exists()
+
+
+def test_journal_replayed_after_crash(tmp_path):
+    path = tmp_path / "labels.csv"
+    path.write_text("file,label\na.wav,1\n", encoding="utf-8")
+    (tmp_path / "labels.csv.journal").write_text("b.wav,0\na.wav,0\n", encoding="utf-8")
+    store = LabelStore(str(path))
+    assert store.get("a.wav") == "0"
+    assert store.get("b.wav") == "0"
+    store.close()
+    assert read_csv(path) == [("file", "label"), ("b.wav", "0"), ("a.wav", "0")]
+
+
+def test_torn_journal_lines_are_skipped(tmp_path):
+    path = tmp_path / "labels.csv"
+    (tmp_path / "labels.csv.journal").write_text("a.wav,1\nb.wav,\nc.wa", encoding="utf-8")
+    store = LabelStore(str(path))
+    assert store.get("a.wav") == "1"
+    assert "b.wav" not in store
+    assert "c.wa" not in store
+    store.close()
+    assert read_csv(path) == [("file", "label"), ("a.wav", "1")]
+
+
+def test_leftover_old_journal_replayed_before_current(tmp_path):
+    path = tmp_path / "labels.csv"
+    (tmp_path / "labels.csv.journal.old").write_text("a.wav,1\n", encoding="utf-8")
+    (tmp_path / "labels.csv.journal").write_text("a.wav,0\n", encoding="utf-8")
+    store = LabelStore(str(path))
+    assert store.get("a.wav") == "0"
+    store.close()
+    assert not (tmp_path / "labels.csv.journal.old").exists()
+
+
+def test_compaction_triggered_by_threshold(tmp_path):
+    path = tmp_path / "labels.csv"
+    store = LabelStore(str(path), compact_every=3)
+    for i in range(3):
+        store.set(f"{i}.wav", "1")
+    store._compact_thread.join()
+    assert len(read_csv(path)) == 4
+    assert read_csv(store.journal_path) == []
+    store.set("3.wav", "0")
+    store.close()
+    assert read_csv(path)[-1] == ("3.wav", "0")
+
+
+def test_label_writer_flushes_all_queued_labels_on_close(tmp_path):
+    store = LabelStore(str(tmp_path / "labels.csv"))
+    batches = []
+    writer = LabelWriter(store, on_flushed=batches.append)
+    for i in range(100):
+        writer.put(f"{i}.wav", "1", 1.0)
+    writer.close()
+    assert len(store) == 100
+    assert sum(len(batch) for batch in batches) == 100
+    store.close()
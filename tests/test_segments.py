@@ -0,0 +1,122 @@
+import csv
+import random
+
+import numpy as np
+import soundfile as sf
+from PIL import Image
+
+from segments import IntervalIndex, Segment, SegmentStore
+from spectrogram import hz_to_row, read_layout, render_spectrogram, row_to_hz
+
+
+def seg(start, end, label="1", fmin=None, fmax=None):
+    return Segment(start, end, fmin, fmax, label)
+
+
+def brute_query(segments, lo, hi):
+    return sorted((s for s in segments if s.start <= hi and s.end >= lo), key=lambda s: (s.start, s.end))
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [tuple(row) for row in csv.reader(f)]
+
+
+def test_empty_index():
+    index = IntervalIndex([])
+    assert len(index) == 0
+    assert index.query(0, 10) == []
+
+
+def test_touching_endpoints_and_point_query():
+    index = IntervalIndex([seg(0, 1), seg(1, 2), seg(3, 4)])
+    assert index.query(1, 1) == [seg(0, 1), seg(1, 2)]
+    assert index.query(2.5, 2.9) == []
+    assert index.query(4, 9) == [seg(3, 4)]
+    assert index.query(-5, -1) == []
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(0)
+    segments = []
+    for _ in range(500):
+        start = rng.uniform(0, 100)
+        segments.append(seg(start, start + rng.expovariate(0.2)))
+    index = IntervalIndex(segments)
+    for _ in range(300):
+        lo = rng.uniform(-5, 105)
+        hi = lo + rng.uniform(0, 10)
+        assert index.query(lo, hi) == brute_query(segments, lo, hi)
+
+
+def test_store_add_remove_survive_restart(tmp_path):
+    path = str(tmp_path / "labels_segments.csv")
+    store = SegmentStore(path)
+    store.add("a.wav", seg(0.5, 1.25, "1", 200.0, 4000.0))
+    store.add("a.wav", seg(2.0, 3.0, "0"))
+    first = store.index("a.wav").query(0, 1)[0]
+    store.remove("a.wav", first)
+    assert store.index("a.wav").query(0, 10) == [seg(2.0, 3.0, "0")]
+    # 未合并时只写日志，模拟崩溃后重新打开
+    store2 = SegmentStore(path)
+    assert store2.index("a.wav").query(0, 10) == [seg(2.0, 3.0, "0")]
+    store2.close()
+    assert read_csv(path) == [tuple(SegmentStore.HEADER), ("a.wav", "2.0000", "3.0000", "", "", "0")]
+    assert not (tmp_path / "labels_segments.csv.journal").exists()
+
+
+def test_store_remove_after_reload_matches_rounded_values(tmp_path):
+    path = str(tmp_path / "labels_segments.csv")
+    store = SegmentStore(path)
+    store.add("a.wav", seg(1 / 3, 2 / 3, "1", 123.456, None))
+    store.close()
+    store = SegmentStore(path)
+    (loaded,) = store.index("a.wav").query(0, 1)
+    store.remove("a.wav", loaded)
+    store.close()
+    assert SegmentStore(path).index("a.wav").query(0, 1) == []
+
+
+def test_store_skips_torn_journal_lines(tmp_path):
+    path = tmp_path / "labels_segments.csv"
+    (tmp_path / "labels_segments.csv.journal").write_text(
+        "+,a.wav,0.0000,1.0000,,,1\n+,a.wav,2.0000,3.0000,,,1\n-,a.wav,0.0000,1.0", encoding="utf-8")
+    store = SegmentStore(str(path))
+    assert len(store.index("a.wav")) == 2
+    store.close()
+
+
+def test_store_compaction_triggered_by_threshold(tmp_path):
+    path = tmp_path / "labels_segments.csv"
+    store = SegmentStore(str(path), compact_every=3)
+    for i in range(3):
+        store.add("a.wav", seg(i, i + 0.5))
+    store._compact_thread.join()
+    assert len(read_csv(path)) == 4
+    assert read_csv(store.journal_path) == []
+    store.add("a.wav", seg(9, 10))
+    store.close()
+    assert read_csv(path)[-1] == ("a.wav", "9.0000", "10.0000", "", "", "1")
+
+
+def test_row_to_hz_round_trip_and_limits():
+    for first_bin in (0, 1):
+        assert row_to_hz(0.0, 16000, first_bin=first_bin) == 8000
+        assert row_to_hz(1.0, 16000, first_bin=first_bin) == max(first_bin - 0.5, 0) * 16000 / 1024
+        for hz in (100.0, 1234.5, 7000.0):
+            assert abs(row_to_hz(hz_to_row(hz, 16000, first_bin=first_bin), 16000, first_bin=first_bin) - hz) < 1e-6
+    # 整图 513 行：最底行中心为直流分量
+    assert abs(row_to_hz(1 - 0.5 / 513, 16000)) < 1e-9
+
+
+def test_read_layout_only_for_rendered_spectrograms(tmp_path):
+    audio_path = str(tmp_path / "a.wav")
+    sf.write(audio_path, np.zeros(8000, dtype=np.float32), 16000)
+    rendered = str(tmp_path / "a.png")
+    render_spectrogram(audio_path, rendered, n_fft=512)
+    assert read_layout(rendered) == {"n_fft": 512, "first_bin": 0}
+    # 数据集自带的 PNG 没有布局信息
+    shipped = str(tmp_path / "b.png")
+    Image.new("RGB", (10, 10)).save(shipped)
+    assert read_layout(shipped) is None
+    assert read_layout(str(tmp_path / "missing.png")) is None
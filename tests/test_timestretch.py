@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from timestretch import MAX_RATE, MIN_RATE, WSOLA, Varispeed
+
+SAMPLERATE = 16000
+BLOCK = 1000
+
+
+def tone(hz=440.0, seconds=3.0, channels=2):
+    t = np.arange(int(SAMPLERATE * seconds)) / SAMPLERATE
+    return np.repeat(np.sin(2 * np.pi * hz * t).astype(np.float32)[:, None], channels, axis=1)
+
+
+def stream(stretcher, samples):
+    """分块送入，返回 (完整输出, 每块之后的 (position, 累计输出帧数))"""
+    outputs, trace, total = [], [], 0
+    for start in range(0, len(samples), BLOCK):
+        out = stretcher.process(samples[start:start + BLOCK], final=start + BLOCK >= len(samples))
+        outputs.append(out)
+        total += len(out)
+        trace.append((stretcher.position, total))
+    return np.concatenate(outputs), trace
+
+
+def dominant_hz(samples):
+    spectrum = np.abs(np.fft.rfft(samples[:, 0] * np.hanning(len(samples))))
+    return np.argmax(spectrum) * SAMPLERATE / len(samples)
+
+
+def make(kind, rate, channels=2):
+    if kind == "wsola":
+        return WSOLA(rate, channels, SAMPLERATE)
+    return Varispeed(rate, channels)
+
+
+@pytest.mark.parametrize("kind", ["varispeed", "wsola"])
+@pytest.mark.parametrize("rate", [MIN_RATE, 0.5, 1.0, 1.7, MAX_RATE])
+def test_output_length_is_input_over_rate(kind, rate):
+    samples = tone()
+    stretcher = make(kind, rate)
+    out, _ = stream(stretcher, samples)
+    # WSOLA 最后一次冲洗会多出不到一帧的重叠尾部
+    tolerance = 1 if kind == "varispeed" else stretcher.frame
+    assert abs(len(out) - len(samples) / rate) <= tolerance
+    assert out.shape[1] == samples.shape[1]
+
+
+@pytest.mark.parametrize("kind", ["varispeed", "wsola"])
+@pytest.mark.parametrize("rate", [MIN_RATE, 0.5, 1.0, 1.7, MAX_RATE])
+def test_position_tracks_output(kind, rate):
+    samples = tone()
+    stretcher = make(kind, rate)
+    _, trace = stream(stretcher, samples)
+    slack = rate + 1 if kind == "varispeed" else rate * stretcher.hop
+    previous = 0
+    for position, total in trace[:-1]:
+        assert previous <= position <= len(samples)
+        assert abs(position - total * rate) <= slack
+        previous = position
+    assert trace[-1][0] == len(samples)  # 冲洗后全部输入都已转换
+
+
+def test_wsola_keeps_pitch_and_varispeed_shifts_it():
+    samples = tone(440.0, channels=1)
+    wsola, _ = stream(WSOLA(0.5, 1, SAMPLERATE), samples)
+    varispeed, _ = stream(Varispeed(0.5, 1), samples)
+    assert abs(dominant_hz(wsola) - 440.0) < 5
+    assert abs(dominant_hz(varispeed) - 220.0) < 5
+
+
+def test_empty_final_block_flushes():
+    stretcher = Varispeed(2.0, 1)
+    out = stretcher.process(np.ones((100, 1), np.float32))
+    out = np.concatenate([out, stretcher.process(np.zeros((0, 1), np.float32), final=True)])
+    assert len(out) == 50
+    assert stretcher.position == 100
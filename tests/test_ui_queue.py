@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import Future
+
+from ui_queue import MAX_INTERVAL_MS, UiQueue
+
+
+class FakeRoot:
+    """只记录 after 定时器的假 Tk 根窗口，由测试手动推进"""
+
+    def __init__(self):
+        self.timers = {}
+        self.next_id = 0
+        self.errors = []
+
+    def after(self, ms, fn):
+        self.next_id += 1
+        self.timers[self.next_id] = (ms, fn)
+        return self.next_id
+
+    def after_cancel(self, timer):
+        self.timers.pop(timer, None)
+
+    def report_callback_exception(self, *exc_info):
+        self.errors.append(exc_info[1])
+
+    def tick(self):
+        """执行当前全部到期的定时器，返回执行的个数"""
+        due, self.timers = self.timers, {}
+        for _, fn in due.values():
+            fn()
+        return len(due)
+
+
+def test_no_timer_while_idle():
+    root = FakeRoot()
+    UiQueue(root)
+    assert root.timers == {}
+
+
+def test_polls_only_until_expected_results_arrive():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    results = []
+    ui.expect(2)
+    ui.expect()
+    assert len(root.timers) == 1  # 已在轮询时不再重复启动
+    ui.post(results.append, "a", done=2)
+    root.tick()
+    assert results == ["a"] and len(root.timers) == 1
+    ui.post(results.append, "b")
+    root.tick()
+    assert results == ["a", "b"]
+    assert root.timers == {}
+
+
+def test_backs_off_while_waiting():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    ui.expect()
+    for _ in range(10):
+        root.tick()
+    (ms, _), = root.timers.values()
+    assert ms == MAX_INTERVAL_MS
+
+
+def test_when_done_from_worker_thread():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    future = Future()
+    seen = []
+    ui.when_done(future, lambda tag, f: seen.append((tag, f.result())), "x")
+    threading.Thread(target=future.set_result, args=(42,)).start()
+    while root.timers:
+        root.tick()
+    assert seen == [("x", 42)]
+
+
+def test_run_thread_reports_exceptions_through_the_future():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    seen = []
+
+    def fail():
+        raise ValueError("boom")
+
+    ui.run_thread(fail, lambda f: seen.append(f.exception()))
+    while root.timers:
+        root.tick()
+    assert isinstance(seen[0], ValueError)
+
+
+def test_callback_exception_is_reported_and_still_settles():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    ui.expect()
+    ui.post(lambda: 1 / 0)
+    root.tick()
+    assert isinstance(root.errors[0], ZeroDivisionError)
+    assert root.timers == {}
+
+
+def test_expect_inside_callback_keeps_single_timer():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    ui.expect()
+    ui.post(ui.expect)
+    root.tick()
+    assert len(root.timers) == 1
+
+
+def test_close_stops_polling_and_drops_results():
+    root = FakeRoot()
+    ui = UiQueue(root)
+    seen = []
+    ui.expect()
+    ui.close()
+    ui.post(seen.append, 1)
+    assert root.timers == {} and seen == []
@@ -0,0 +1,56 @@
+import random
+
+from label_store import UnlabelledIndex
+
+
+def brute_next(files, labelled, start):
+    for offset in range(len(files)):
+        i = (start + offset) % len(files)
+        if files[i] not in labelled:
+            return i
+    return None
+
+
+def test_empty_list():
+    assert UnlabelledIndex([], set()).next_unlabelled(0) is None
+
+
+def test_all_labelled_returns_none():
+    files = ["a", "b", "c"]
+    index = UnlabelledIndex(files, set(files))
+    assert index.next_unlabelled(0) is None
+    assert index.next_unlabelled(2) is None
+
+
+def test_start_is_inclusive_and_wraps_around():
+    files = ["a", "b", "c", "d"]
+    index = UnlabelledIndex(files, {"c", "d"})
+    assert index.next_unlabelled(0) == 0
+    assert index.next_unlabelled(2) == 0  # 末尾全部已标注，回到开头
+    assert index.next_unlabelled(5) == 1  # start 超出长度时取模
+
+
+def test_mark_labelled_and_is_labelled():
+    files = ["a", "b", "c"]
+    index = UnlabelledIndex(files, set())
+    assert not index.is_labelled(1)
+    index.mark_labelled(1)
+    assert index.is_labelled(1)
+    assert index.next_unlabelled(1) == 2
+    index.mark_labelled(2)
+    index.mark_labelled(0)
+    assert index.next_unlabelled(0) is None
+
+
+def test_matches_brute_force_with_random_marks():
+    rng = random.Random(0)
+    files = [f"{i}.wav" for i in range(300)]
+    labelled = {name for name in files if rng.random() < 0.7}
+    index = UnlabelledIndex(files, labelled)
+    for _ in range(500):
+        if rng.random() < 0.3:
+            i = rng.randrange(len(files))
+            index.mark_labelled(i)
+            labelled.add(files[i])
+        start = rng.randrange(len(files))
+        assert index.next_unlabelled(start) == brute_next(files, labelled, start)
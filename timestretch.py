@@ -0,0 +1,110 @@
+"""流式变速：WSOLA 保持音高的时间伸缩，以及变速变调的线性插值重采样。
+
+两种处理器接口相同：process(block, final) 输入 (帧, 声道) float32，返回已就绪的输出；
+position 为已经转换为输出的输入帧数，用于把输出映射回原音频的时间位置。
+"""
+import numpy as np
+
+MIN_RATE = 0.25
+MAX_RATE = 3.0
+
+
+class Varispeed:
+    """变速变调：按 rate 步长线性插值重采样，放慢时高频内容随之降到可听范围"""
+
+    def __init__(self, rate, channels):
+        self.rate = rate
+        self.position = 0
+        self._received = 0  # 已输入的帧数；final 时补的零不计入 position
+        self._buf = np.zeros((0, channels), np.float32)
+        self._phase = 0.0  # 下一个输出采样在 _buf 中的位置
+
+    def process(self, block, final=False):
+        buf = np.concatenate([self._buf, block]) if len(self._buf) else block
+        self._received += len(block)
+        if final:
+            buf = np.concatenate([buf, np.zeros((1, buf.shape[1]), np.float32)])
+        usable = len(buf) - 1  # 插值需要右侧相邻采样
+        count = max(0, int(np.ceil((usable - self._phase) / self.rate)))
+        idx = self._phase + np.arange(count) * self.rate
+        i = idx.astype(np.int64)
+        frac = (idx - i).astype(np.float32)[:, None]
+        out = buf[i] * (1 - frac) + buf[i + 1] * frac
+        phase = self._phase + count * self.rate
+        drop = min(int(phase), len(buf))
+        self._buf = buf[drop:]
+        self._phase = phase - drop
+        self.position = min(self.position + drop, self._received)
+        return out
+
+
+class WSOLA:
+    """波形相似叠加（WSOLA）时间伸缩，保持音高。
+
+    每帧长 frame、输出步长 frame/2（Hann 窗 50% 重叠相加）；分析位置按 rate * 输出步长前进，
+    并在 ±tolerance 内寻找与上一帧自然延续最相似的位置，避免相位不连续造成的颤音。
+    """
+
+    def __init__(self, rate, channels, samplerate, frame_seconds=0.04):
+        self.rate = rate
+        self.frame = max(256, int(samplerate * frame_seconds) // 2 * 2)
+        self.hop = self.frame // 2
+        self.tolerance = self.frame // 4
+        self.position = 0
+        self._window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame) / self.frame)).astype(np.float32)[:, None]
+        self._buf = np.zeros((0, channels), np.float32)
+        self._buf_start = 0      # _buf[0] 在输入中的帧号
+        self._ideal = 0.0        # 下一帧的理想分析位置
+        self._natural = None     # 上一帧的自然延续位置
+        self._ola = np.zeros((self.frame, channels), np.float32)
+        self._fft_size = 1 << int(np.ceil(np.log2(2 * self.frame + 2 * self.tolerance)))
+
+    def process(self, block, final=False):
+        self._buf = np.concatenate([self._buf, block]) if len(self._buf) else block
+        end = self._buf_start + len(self._buf)
+        if final:
+            pad = 2 * self.frame
+            self._buf = np.concatenate([self._buf, np.zeros((pad, self._buf.shape[1]), np.float32)])
+        outputs = []
+        while True:
+            ideal = int(round(self._ideal))
+            if final and ideal >= end:
+                break
+            need = max(ideal + self.tolerance, self._natural or 0) + self.frame
+            if self._buf_start + len(self._buf) < need:
+                break
+            pos = ideal if self._natural is None else self._best_offset(ideal)
+            start = pos - self._buf_start
+            self._ola += self._buf[start:start + self.frame] * self._window
+            outputs.append(self._ola[:self.hop].copy())
+            self._ola = np.concatenate([self._ola[self.hop:], np.zeros_like(self._ola[:self.hop])])
+            self._natural = pos + self.hop
+            self._ideal += self.rate * self.hop
+            self.position = min(int(self._ideal), end)
+            # 丢弃之后不会再用到的输入
+            keep_from = min(int(self._ideal) - self.tolerance, self._natural) - self._buf_start
+            if keep_from > 0:
+                self._buf = self._buf[keep_from:]
+                self._buf_start += keep_from
+        if final:
+            outputs.append(self._ola[:self.hop].copy())
+            self.position = end
+        if not outputs:
+            return np.zeros((0, self._buf.shape[1]), np.float32)
+        return np.concatenate(outputs)
+
+    def _best_offset(self, ideal):
+        """在 [ideal - tolerance, ideal + tolerance] 中找与自然延续互相关最大的起点（FFT 计算）"""
+        lo = max(ideal - self.tolerance, self._buf_start)
+        template = self._buf[self._natural - self._buf_start:][:self.frame].mean(axis=1)
+        region = self._buf[lo - self._buf_start:ideal + self.tolerance + self.frame - self._buf_start].mean(axis=1)
+        corr = np.fft.irfft(np.fft.rfft(region, self._fft_size) * np.conj(np.fft.rfft(template, self._fft_size)),
+                            self._fft_size)[:len(region) - self.frame + 1]
+        return lo + int(np.argmax(corr))
+
+
+def make_stretcher(rate, channels, samplerate, preserve_pitch=True):
+    """preserve_pitch 为 True 时返回 WSOLA（保持音高），否则返回 Varispeed（变速变调）"""
+    if preserve_pitch:
+        return WSOLA(rate, channels, samplerate)
+    return Varispeed(rate, channels)
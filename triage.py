@@ -0,0 +1,114 @@
+"""空白音频预筛：逐块读取音频，按帧计算能量与谱平坦度，为没有事件的音频给出建议标签。
+
+判定规则（逐帧，帧长 spectrogram.N_FFT 不重叠）：
+- 整段 RMS 低于 silence_db：静音
+- 最响帧比中位帧高不到 event_db，且没有哪一帧的谱平坦度明显低于中位数
+  （最低值 / 中位数 > flatness）：平稳噪声。事件（鸣叫、人声等）会让所在帧的频谱变得有结构、平坦度下降，
+  用相对值判断可以兼容有色的背景噪声
+两者都视为空白，建议标注为 label。结果写入数据集目录下的 triage.csv，标注工具据此显示建议、批量确认或自动跳过。
+
+用法：
+    python triage.py 数据集目录 [--workers N] [--label 0] [--event-db 6] [--flatness 0.5] [--silence-db -60]
+"""
+import argparse
+import csv
+import os
+import sys
+from functools import partial
+
+import numpy as np
+
+from batch import Batch
+from manifest import AUDIO_EXTENSIONS, scan_folder
+from spectrogram import frame_blocks, load_source
+
+TRIAGE_FILE = "triage.csv"
+FIELDS = ["file", "proposal", "reason", "rms_db", "event_db", "flatness_ratio"]
+
+
+def frame_stats(path):
+    """分块计算每帧能量（dB）与谱平坦度，返回 (能量数组, 平坦度数组, 整段 RMS dB)"""
+    samples, _ = load_source(path)
+    length = len(samples)
+    energies, flatness = [], []
+    sum_sq = 0.0
+    for block, power in frame_blocks(samples):
+        sum_sq += float(np.dot(block, block))
+        if not len(power):
+            continue
+        power = power + 1e-20
+        energies.append(10 * np.log10(power.sum(axis=1)))
+        # 谱平坦度 = 几何平均 / 算术平均：白噪声接近 1，纯音或有结构的事件接近 0
+        flatness.append(np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1))
+    rms_db = 10 * np.log10(max(sum_sq / length, 1e-20)) if length else -200.0
+    if not energies:
+        return np.zeros(0), np.zeros(0), rms_db
+    return np.concatenate(energies), np.concatenate(flatness), rms_db
+
+
+def triage_one(path, label="0", event_db=6.0, flatness=0.5, silence_db=-60.0):
+    """子进程中执行，返回 triage.csv 的一行（dict）；出错时 reason 为错误信息"""
+    name = os.path.basename(path)
+    try:
+        energies, flat, rms_db = frame_stats(path)
+    except (OSError, RuntimeError, ValueError) as e:
+        return {"file": name, "proposal": "", "reason": f"error: {e}", "rms_db": "", "event_db": "", "flatness_ratio": ""}
+    dynamic = float(energies.max() - np.median(energies)) if len(energies) else 0.0
+    median_flat = float(np.median(flat)) if len(flat) else 0.0
+    ratio = float(flat.min()) / median_flat if median_flat > 0 else 1.0
+    if rms_db < silence_db:
+        proposal, reason = label, "silent"
+    elif dynamic < event_db and ratio > flatness:
+        proposal, reason = label, "stationary"
+    else:
+        proposal, reason = "", ""
+    return {"file": name, "proposal": proposal, "reason": reason, "rms_db": f"{rms_db:.1f}",
+            "event_db": f"{dynamic:.1f}", "flatness_ratio": f"{ratio:.3f}"}
+
+
+def load_proposals(dataset_folder):
+    """读取 triage.csv，返回 {文件名: (建议标签, 原因)}，只包含有建议的音频"""
+    path = os.path.join(dataset_folder, TRIAGE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["file"]: (row["proposal"], row["reason"]) for row in csv.DictReader(f) if row["proposal"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="空白音频预筛，结果写入数据集目录下的 triage.csv")
+    parser.add_argument("dataset", help="包含 audio/ 的数据集目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="进程数（默认全部核心）")
+    parser.add_argument("--label", default="0", help="空白音频的建议标签（默认 0）")
+    parser.add_argument("--event-db", type=float, default=6.0, help="最响帧高出中位帧不足此值视为无事件")
+    parser.add_argument("--flatness", type=float, default=0.5, help="最低帧谱平坦度与中位数之比高于此值视为平稳噪声")
+    parser.add_argument("--silence-db", type=float, default=-60.0, help="整段 RMS 低于此值视为静音")
+    args = parser.parse_args(argv)
+
+    audio_folder = os.path.join(args.dataset, "audio")
+    if not os.path.isdir(audio_folder):
+        parser.error(f"未找到 {audio_folder}")
+    paths = [os.path.join(audio_folder, name) for name in scan_folder(audio_folder, AUDIO_EXTENSIONS)]
+    print(f"共 {len(paths)} 条，{args.workers} 个进程")
+    if not paths:
+        return 0
+
+    job = partial(triage_one, label=args.label, event_db=args.event_db,
+                  flatness=args.flatness, silence_db=args.silence_db)
+    batch = Batch(job, paths, args.workers)
+    rows = list(batch)
+
+    path = os.path.join(args.dataset, TRIAGE_FILE)
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(path + ".tmp", path)
+
+    proposed = sum(1 for row in rows if row["proposal"])
+    failed = [(row["file"], row["reason"]) for row in rows if row["reason"].startswith("error")]
+    return batch.report(failed, f"完成：{proposed}/{len(rows)} 条建议标注为 {args.label}，用时 {batch.elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+
+MIN_INTERVAL_MS = 10
+MAX_INTERVAL_MS = 50  # 长时间的后台任务期间逐步放慢轮询，最慢每秒约 20 次
+
+
+class UiQueue:
+    """工作线程把结果交回 Tk 线程的唯一通道。
+
+    Tkinter 不是线程安全的，工作线程（包括 Future 的完成回调）不能调用 root.after 或任何控件方法。
+    post 只向线程安全的队列放入 (函数, 参数)，不触碰 Tk；Tk 线程用 root.after 轮询队列并依次执行。
+
+    只在有后台任务未完成时轮询：Tk 线程提交任务前调用 expect（when_done、run_thread 已包含），
+    计数从 0 变为 1 时启动轮询；任务的结果经 post 送回并执行后计数减一，队列为空且计数为 0 时停止，
+    空闲时没有任何定时器。计数只在 Tk 线程中读写。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._queue = queue.SimpleQueue()
+        self._interval = MIN_INTERVAL_MS
+        self._timer = None
+        self._outstanding = 0
+        self._closed = False
+
+    def expect(self, count=1):
+        """在 Tk 线程中调用：登记 count 个稍后经 post 送回的结果，必要时启动轮询"""
+        if self._closed:
+            return
+        self._outstanding += count
+        if self._timer is None and self._outstanding > 0:
+            self._interval = MIN_INTERVAL_MS
+            self._timer = self.root.after(self._interval, self._drain)
+
+    def post(self, fn, *args, done=1):
+        """可在任意线程中调用：稍后在 Tk 线程中执行 fn(*args)，之后抵消 done 个已登记的结果；关闭后丢弃"""
+        if not self._closed:
+            self._queue.put((fn, args, done))
+
+    def when_done(self, future, fn, *args):
+        """在 Tk 线程中调用：Future 完成（包括被取消）后在 Tk 线程中调用 fn(*args, future)"""
+        self.expect()
+        future.add_done_callback(lambda f: self.post(fn, *args, f))
+
+    def run_thread(self, target, fn, *args):
+        """在 Tk 线程中调用：在新的后台线程中执行 target()，完成后在 Tk 线程中调用 fn(*args, future)"""
+        future = Future()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(target())
+            except BaseException as e:
+                future.set_exception(e)
+
+        self.when_done(future, fn, *args)
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def close(self):
+        """在 Tk 线程中调用：停止轮询，之后提交的结果全部丢弃"""
+        self._closed = True
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def _drain(self):
+        self._timer = None
+        handled = False
+        while not self._closed:
+            try:
+                fn, args, done = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            handled = True
+            self._outstanding = max(self._outstanding - done, 0)
+            try:
+                fn(*args)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        if self._closed or self._timer is not None:
+            return  # 回调中调用 expect 时已重新启动轮询
+        if self._outstanding == 0 and self._queue.empty():
+            return
+        self._interval = MIN_INTERVAL_MS if handled else min(self._interval * 2, MAX_INTERVAL_MS)
+        self._timer = self.root.after(self._interval, self._drain)
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import soundfile as sf
+
+from audio_info import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, read_wav_info
+
+# (格式, 位深) -> (memmap dtype, 缩放系数, 零点偏移)
+_SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): (np.uint8, 1 / 128, 128),
+    (WAVE_FORMAT_PCM, 16): (np.dtype("<i2"), 1 / 32768, 0),
+    (WAVE_FORMAT_PCM, 24): (np.uint8, 1 / 8388608, 0),  # 3 字节一个采样，读取时再拼成 int32
+    (WAVE_FORMAT_PCM, 32): (np.dtype("<i4"), 1 / 2147483648, 0),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): (np.dtype("<f4"), 1, 0),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): (np.dtype("<f8"), 1, 0),
+}
+
+
+def _mappable_format(info):
+    fmt = _SAMPLE_FORMATS.get((info.format_tag, info.bits_per_sample))
+    if fmt is None or not info.channels or info.block_align != info.channels * info.bits_per_sample // 8:
+        return None
+    return fmt
+
+
+def is_mappable(path):
+    """是否为可直接内存映射的 PCM / 浮点 WAV"""
+    if os.path.splitext(path)[1].lower() != ".wav":
+        return False
+    try:
+        return _mappable_format(read_wav_info(path)) is not None
+    except (OSError, ValueError):
+        return False
+
+
+class WavMap:
+    """WAV data 块的内存映射只读视图。
+
+    打开时只解析文件头，采样由操作系统按页调入；read/read_range 只转换所需的帧，
+    跳转只是移动游标，内存占用与音频长度无关。
+    读取接口与 soundfile.SoundFile 的 seek/read 一致，可直接交给播放引擎使用。
+    """
+
+    def __init__(self, path):
+        info = read_wav_info(path)
+        fmt = _mappable_format(info)
+        if fmt is None:
+            raise ValueError(f"不支持内存映射的 WAV 格式: {path}")
+        dtype, self._scale, self._zero = fmt
+        self.samplerate = info.samplerate
+        self.channels = info.channels
+        self.frames = info.data_size // info.block_align
+        self._packed24 = info.bits_per_sample == 24
+        shape = (self.frames, self.channels, 3) if self._packed24 else (self.frames, self.channels)
+        if self.frames:
+            self.data = np.memmap(path, dtype=dtype, mode="r", offset=info.data_offset, shape=shape)
+        else:
+            self.data = np.zeros(shape, dtype=dtype)  # mmap 不能映射 0 字节
+        self._pos = 0
+
+    def __len__(self):
+        return self.frames
+
+    def read_range(self, start, stop):
+        """读取 [start, stop) 帧，返回 float32 的 (帧, 声道) 数组"""
+        raw = self.data[max(start, 0):min(stop, self.frames)]
+        if self._packed24:
+            b = raw.astype(np.int32)
+            raw = ((b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)) << 8) >> 8  # 符号扩展
+        out = raw.astype(np.float32)
+        if self._zero:
+            out -= self._zero
+        if self._scale != 1:
+            out *= self._scale
+        return out
+
+    # ===== 与 soundfile.SoundFile 兼容的游标接口 =====
+
+    def seek(self, frame):
+        self._pos = min(max(frame, 0), self.frames)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, frames=-1, dtype="float32", always_2d=True):
+        stop = self.frames if frames < 0 else self._pos + frames
+        out = self.read_range(self._pos, stop)
+        self._pos += len(out)
+        return out if always_2d or self.channels > 1 else out[:, 0]
+
+    def close(self):
+        self.data = None  # 映射在最后一个引用释放时解除
+
+
+def open_audio(path):
+    """打开音频用于流式读取：可映射的 WAV 返回 WavMap，其余格式返回 soundfile.SoundFile"""
+    if is_mappable(path):
+        return WavMap(path)
+    return sf.SoundFile(path)